@@ -1,9 +1,34 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from app.shared.config import get_settings
+import httpx
 import os
 
 settings = get_settings()
 
+# One HTTP/2 connection pool shared by every Supabase client in the process,
+# so requests reuse warm TLS connections instead of opening new ones
+_http_client = None
+
+
+def get_http_client() -> httpx.Client:
+    """Get the shared HTTPX client used for Supabase requests"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.supabase_pool_size,
+                max_keepalive_connections=settings.supabase_pool_size,
+            ),
+        )
+    return _http_client
+
+
+def create_supabase_client(url: str, key: str) -> Client:
+    """Create a Supabase client backed by the shared connection pool"""
+    return create_client(url, key, options=ClientOptions(httpx_client=get_http_client()))
+
 # Safety check: Never use real DB in test environment
 if settings.environment == "test":
     # In test environment, create a mock client that fails on actual operations
@@ -11,14 +36,14 @@ if settings.environment == "test":
         def table(self, table_name):
             raise RuntimeError(
                 f"DANGER: Attempted to access table '{table_name}' in test environment! "
-                "Tests must mock 'app.database.supabase'. "
-                "Use: @patch('app.database.supabase', mock_supabase_client)"
+                "Tests must inject a fake client instead. "
+                "Use: CategoryRepository(mock_supabase_client)"
             )
         
         def __getattr__(self, name):
             raise RuntimeError(
                 f"DANGER: Attempted to use Supabase method '{name}' in test environment! "
-                "Tests must mock 'app.database.supabase'."
+                "Tests must inject a fake client into the repository."
             )
     
     supabase = MockSupabaseClient()
@@ -27,4 +52,4 @@ else:
     if not settings.effective_supabase_url or not settings.effective_supabase_key:
         raise ValueError("Supabase URL and key must be configured for non-test environments")
     
-    supabase = create_client(settings.effective_supabase_url, settings.effective_supabase_key)
\ No newline at end of file
+    supabase = create_supabase_client(settings.effective_supabase_url, settings.effective_supabase_key)
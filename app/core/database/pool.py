@@ -0,0 +1,46 @@
+"""
+Optional asyncpg connection pool for hot read paths
+
+When DATABASE_URL is set and asyncpg is installed, repositories read through
+this pool directly instead of going over PostgREST. Otherwise get_db_pool()
+returns None and callers fall back to the Supabase client.
+"""
+import asyncio
+from typing import Optional
+from app.shared.config import get_settings
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+    asyncpg = None
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_db_pool() -> Optional["asyncpg.Pool"]:
+    """Get the shared asyncpg pool, or None if direct access isn't configured"""
+    global _pool
+    if _pool is not None:
+        return _pool
+    
+    settings = get_settings()
+    if not ASYNCPG_AVAILABLE or not settings.database_url or settings.environment == "test":
+        return None
+    
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                settings.database_url,
+                min_size=10,
+                max_size=50,
+                max_inactive_connection_lifetime=300,
+                command_timeout=60,
+                # Supavisor's transaction pooler can't keep prepared statements
+                statement_cache_size=0,
+                server_settings={"jit": "off"},
+            )
+    return _pool
+
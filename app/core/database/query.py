@@ -0,0 +1,14 @@
+"""
+Helpers for running Supabase queries from async code
+"""
+import asyncio
+
+
+async def execute(query):
+    """
+    Run a PostgREST request builder in a worker thread.
+
+    The Supabase client is synchronous, so calling .execute() directly
+    blocks the event loop and serializes concurrent tool calls.
+    """
+    return await asyncio.to_thread(query.execute)
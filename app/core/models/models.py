@@ -2,16 +2,25 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional, List
 from uuid import UUID
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Input models are built once from tool arguments and never mutated, so
+# freeze them and drop unknown keys instead of carrying them around
+_INPUT_CONFIG = ConfigDict(frozen=True, extra="ignore")
 
 
 class CategoryCreate(BaseModel):
+    model_config = _INPUT_CONFIG
+
     name: str = Field(..., min_length=1, max_length=255)
     is_active: bool = True
     parent_category_id: Optional[UUID] = None
 
 
 class CategoryUpdate(BaseModel):
+    model_config = _INPUT_CONFIG
+
     name: Optional[str] = Field(None, min_length=1, max_length=255)
     is_active: Optional[bool] = None
     parent_category_id: Optional[UUID] = None
@@ -27,6 +36,8 @@ class CategoryResponse(BaseModel):
 
 
 class TransactionCreate(BaseModel):
+    model_config = _INPUT_CONFIG
+
     date: datetime
     amount: Decimal = Field(..., decimal_places=2)
     merchant: Optional[str] = Field(None, max_length=255)
@@ -36,6 +47,8 @@ class TransactionCreate(BaseModel):
 
 
 class TransactionUpdate(BaseModel):
+    model_config = _INPUT_CONFIG
+
     date: Optional[datetime] = None
     amount: Optional[Decimal] = Field(None, decimal_places=2)
     merchant: Optional[str] = Field(None, max_length=255)
@@ -57,6 +70,8 @@ class TransactionResponse(BaseModel):
 
 
 class TagCreate(BaseModel):
+    model_config = _INPUT_CONFIG
+
     value: str = Field(..., min_length=1, max_length=100)
 
 
@@ -66,9 +81,12 @@ class TagResponse(BaseModel):
 
 
 class TransactionTagCreate(BaseModel):
+    model_config = _INPUT_CONFIG
+
     transaction_id: UUID
     tag_id: UUID
 
 
 class TransactionWithTags(TransactionResponse):
+    category_name: Optional[str] = None
     tags: List[TagResponse] = []
\ No newline at end of file
@@ -1,8 +1,15 @@
 import uuid
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
+from pydantic import TypeAdapter
 from supabase import Client
+from app.core.database.query import execute
+from app.core.database.pool import get_db_pool
 from app.core.models.models import CategoryCreate, CategoryUpdate, CategoryResponse
 
+_category_list = TypeAdapter(List[CategoryResponse])
+
+_CATEGORY_COLUMNS = "category_id, name, is_active, parent_category_id"
+
 
 class CategoryRepository:
     def __init__(self, db: Client):
@@ -17,24 +24,76 @@ class CategoryRepository:
             "parent_category_id": str(category.parent_category_id) if category.parent_category_id else None
         }
         
-        result = self.db.table("categories").insert(data).execute()
-        return CategoryResponse(**result.data[0])
+        result = await execute(self.db.table("categories").insert(data))
+        return CategoryResponse.model_validate(result.data[0])
+
+
+    async def create_categories(self, categories: List[CategoryCreate]) -> List[CategoryResponse]:
+        data = [
+            {
+                "category_id": str(uuid.uuid4()),
+                "name": category.name,
+                "is_active": category.is_active,
+                "parent_category_id": str(category.parent_category_id) if category.parent_category_id else None
+            }
+            for category in categories
+        ]
+        
+        result = await execute(self.db.table("categories").insert(data))
+        return _category_list.validate_python(result.data)
 
 
     async def get_category(self, category_id: str) -> Optional[CategoryResponse]:
-        result = self.db.table("categories").select("*").eq("category_id", category_id).execute()
+        pool = await get_db_pool()
+        if pool:
+            row = await pool.fetchrow(
+                f"SELECT {_CATEGORY_COLUMNS} FROM categories WHERE category_id = $1::uuid",
+                category_id
+            )
+            return CategoryResponse.model_validate(dict(row)) if row else None
+        
+        result = await execute(self.db.table("categories").select("*").eq("category_id", category_id))
         if result.data:
-            return CategoryResponse(**result.data[0])
+            return CategoryResponse.model_validate(result.data[0])
         return None
 
 
     async def get_categories(self, skip: int = 0, limit: int = 100, active_only: bool = True) -> List[CategoryResponse]:
+        pool = await get_db_pool()
+        if pool:
+            rows = await pool.fetch(
+                f"SELECT {_CATEGORY_COLUMNS} FROM categories"
+                f"{' WHERE is_active' if active_only else ''} OFFSET $1 LIMIT $2",
+                skip, limit
+            )
+            return _category_list.validate_python([dict(row) for row in rows])
+        
         query = self.db.table("categories").select("*")
         if active_only:
             query = query.eq("is_active", True)
         
-        result = query.range(skip, skip + limit - 1).execute()
-        return [CategoryResponse(**item) for item in result.data]
+        result = await execute(query.range(skip, skip + limit - 1))
+        return _category_list.validate_python(result.data)
+
+
+    async def get_categories_by_ids(self, category_ids: Iterable[str]) -> Dict[str, CategoryResponse]:
+        """Fetch several categories in one query, keyed by category_id"""
+        ids = list({str(category_id) for category_id in category_ids})
+        if not ids:
+            return {}
+        
+        pool = await get_db_pool()
+        if pool:
+            rows = await pool.fetch(
+                f"SELECT {_CATEGORY_COLUMNS} FROM categories WHERE category_id = ANY($1::uuid[])",
+                ids
+            )
+            data = [dict(row) for row in rows]
+        else:
+            result = await execute(self.db.table("categories").select("*").in_("category_id", ids))
+            data = result.data
+        
+        return {str(category.category_id): category for category in _category_list.validate_python(data)}
 
 
     async def update_category(self, category_id: str, category_update: CategoryUpdate) -> Optional[CategoryResponse]:
@@ -49,21 +108,48 @@ class CategoryRepository:
         if not update_data:
             return await self.get_category(category_id)
         
-        result = self.db.table("categories").update(update_data).eq("category_id", category_id).execute()
+        result = await execute(self.db.table("categories").update(update_data).eq("category_id", category_id))
         if result.data:
-            return CategoryResponse(**result.data[0])
+            return CategoryResponse.model_validate(result.data[0])
         return None
 
 
     async def delete_category(self, category_id: str) -> bool:
-        result = self.db.table("categories").update({"is_active": False}).eq("category_id", category_id).execute()
+        result = await execute(self.db.table("categories").update({"is_active": False}).eq("category_id", category_id))
         return len(result.data) > 0
 
 
 
 
+    async def find_category_by_name(self, name: str, active_only: bool = True) -> Optional[CategoryResponse]:
+        """Case-insensitive exact match on category name"""
+        pool = await get_db_pool()
+        if pool:
+            row = await pool.fetchrow(
+                f"SELECT {_CATEGORY_COLUMNS} FROM categories WHERE lower(name) = lower($1)"
+                f"{' AND is_active' if active_only else ''} LIMIT 1",
+                name
+            )
+            return CategoryResponse.model_validate(dict(row)) if row else None
+
+        # Escape LIKE wildcards so ilike narrows to case-insensitive matches.
+        # PostgREST rewrites every * to % regardless of escaping, so * is sent
+        # as a single-character wildcard and the exact name is checked here.
+        pattern = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("*", "_")
+        query = self.db.table("categories").select("*").ilike("name", pattern)
+        if active_only:
+            query = query.eq("is_active", True)
+
+        result = await execute(query)
+        lowered = name.lower()
+        for row in result.data:
+            if row["name"].lower() == lowered:
+                return CategoryResponse.model_validate(row)
+        return None
+
+
     async def get_category_by_name(self, name: str) -> Optional[CategoryResponse]:
-        result = self.db.table("categories").select("*").eq("name", name).execute()
+        result = await execute(self.db.table("categories").select("*").eq("name", name))
         if result.data:
-            return CategoryResponse(**result.data[0])
+            return CategoryResponse.model_validate(result.data[0])
         return None
\ No newline at end of file
@@ -1,8 +1,14 @@
+import asyncio
 import uuid
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
+from pydantic import TypeAdapter
 from supabase import Client
+from app.core.database.query import execute
+from app.core.database.pool import get_db_pool
 from app.core.models.models import TagCreate, TagResponse, TransactionTagCreate
 
+_tag_list = TypeAdapter(List[TagResponse])
+
 
 class TagRepository:
     def __init__(self, db: Client):
@@ -15,32 +21,50 @@ class TagRepository:
             "value": tag.value
         }
         
-        result = self.db.table("tags").insert(data).execute()
-        return TagResponse(**result.data[0])
+        result = await execute(self.db.table("tags").insert(data))
+        return TagResponse.model_validate(result.data[0])
 
 
     async def get_tag(self, tag_id: str) -> Optional[TagResponse]:
-        result = self.db.table("tags").select("*").eq("tag_id", tag_id).execute()
+        result = await execute(self.db.table("tags").select("*").eq("tag_id", tag_id))
         if result.data:
-            return TagResponse(**result.data[0])
+            return TagResponse.model_validate(result.data[0])
         return None
 
 
     async def get_tag_by_value(self, value: str) -> Optional[TagResponse]:
-        result = self.db.table("tags").select("*").eq("value", value).execute()
+        result = await execute(self.db.table("tags").select("*").eq("value", value))
         if result.data:
-            return TagResponse(**result.data[0])
+            return TagResponse.model_validate(result.data[0])
         return None
 
 
+    async def get_or_create_tag(self, value: str) -> TagResponse:
+        """Get a tag by value, creating it if missing, in one call"""
+        result = await execute(self.db.rpc("get_or_create_tag", {"p_value": value}))
+        return TagResponse.model_validate(result.data[0])
+
+
+    async def get_tags_by_values(self, values: List[str]) -> List[TagResponse]:
+        result = await execute(self.db.table("tags").select("*").in_("value", values))
+        return _tag_list.validate_python(result.data)
+
+
+    async def create_tags(self, tags: List[TagCreate]) -> List[TagResponse]:
+        data = [{"tag_id": str(uuid.uuid4()), "value": tag.value} for tag in tags]
+        
+        result = await execute(self.db.table("tags").insert(data))
+        return _tag_list.validate_python(result.data)
+
+
     async def get_tags(self, skip: int = 0, limit: int = 100) -> List[TagResponse]:
-        result = self.db.table("tags").select("*").range(skip, skip + limit - 1).execute()
-        return [TagResponse(**item) for item in result.data]
+        result = await execute(self.db.table("tags").select("*").range(skip, skip + limit - 1))
+        return _tag_list.validate_python(result.data)
 
 
     async def delete_tag(self, tag_id: str) -> bool:
-        self.db.table("transaction_tags").delete().eq("tag_id", tag_id).execute()
-        result = self.db.table("tags").delete().eq("tag_id", tag_id).execute()
+        await execute(self.db.table("transaction_tags").delete().eq("tag_id", tag_id))
+        result = await execute(self.db.table("tags").delete().eq("tag_id", tag_id))
         return len(result.data) > 0
 
 
@@ -50,23 +74,93 @@ class TagRepository:
             "tag_id": str(transaction_tag.tag_id)
         }
         
-        result = self.db.table("transaction_tags").insert(data).execute()
+        result = await execute(self.db.table("transaction_tags").insert(data))
+        return len(result.data) > 0
+
+
+    async def add_tags_to_transaction(self, transaction_id: str, tag_ids: List[str]) -> bool:
+        data = [{"transaction_id": transaction_id, "tag_id": tag_id} for tag_id in tag_ids]
+        
+        result = await execute(self.db.table("transaction_tags").insert(data))
         return len(result.data) > 0
 
 
+    async def attach_tags(self, transaction_id: str, values: List[str]) -> List[TagResponse]:
+        """Create missing tags and link all of them to a transaction in one call"""
+        result = await execute(self.db.rpc(
+            "attach_tags",
+            {"p_transaction_id": transaction_id, "p_values": values}
+        ))
+        return _tag_list.validate_python(result.data or [])
+
+
     async def remove_tag_from_transaction(self, transaction_id: str, tag_id: str) -> bool:
-        result = self.db.table("transaction_tags").delete().eq("transaction_id", transaction_id).eq("tag_id", tag_id).execute()
+        result = await execute(self.db.table("transaction_tags").delete().eq("transaction_id", transaction_id).eq("tag_id", tag_id))
+        return len(result.data) > 0
+
+
+    async def remove_tags_from_transaction(self, transaction_id: str, tag_ids: List[str]) -> bool:
+        result = await execute(self.db.table("transaction_tags").delete().eq("transaction_id", transaction_id).in_("tag_id", tag_ids))
         return len(result.data) > 0
 
 
+    async def replace_transaction_tags(self, transaction_id: str, tag_ids: List[str]) -> None:
+        """Make tag_ids the full set of tags linked to a transaction"""
+        pool = await get_db_pool()
+        if pool:
+            # Diff in SQL inside one transaction: a DELETE and an INSERT
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        "DELETE FROM transaction_tags"
+                        " WHERE transaction_id = $1::uuid AND NOT (tag_id = ANY($2::uuid[]))",
+                        transaction_id, tag_ids
+                    )
+                    await conn.execute(
+                        "INSERT INTO transaction_tags (transaction_id, tag_id)"
+                        " SELECT $1::uuid, t.tag_id FROM unnest($2::uuid[]) AS t(tag_id)"
+                        " WHERE NOT EXISTS (SELECT 1 FROM transaction_tags tt"
+                        "  WHERE tt.transaction_id = $1::uuid AND tt.tag_id = t.tag_id)",
+                        transaction_id, tag_ids
+                    )
+            return
+        
+        existing_ids = {str(tag.tag_id) for tag in await self.get_transaction_tags(transaction_id)}
+        wanted_ids = set(tag_ids)
+        
+        # Removed and added links are disjoint rows, so both writes can run at once
+        writes = []
+        to_remove = list(existing_ids - wanted_ids)
+        if to_remove:
+            writes.append(self.remove_tags_from_transaction(transaction_id, to_remove))
+        to_add = list(wanted_ids - existing_ids)
+        if to_add:
+            writes.append(self.add_tags_to_transaction(transaction_id, to_add))
+        await asyncio.gather(*writes)
+
+
     async def get_transaction_tags(self, transaction_id: str) -> List[TagResponse]:
-        result = self.db.table("transaction_tags").select(
+        result = await execute(self.db.table("transaction_tags").select(
             "tags(tag_id, value)"
-        ).eq("transaction_id", transaction_id).execute()
+        ).eq("transaction_id", transaction_id))
+        
+        return _tag_list.validate_python([item["tags"] for item in result.data if item.get("tags")])
+
+
+    async def get_tags_for_transactions(self, transaction_ids: Iterable[str]) -> Dict[str, List[TagResponse]]:
+        """Fetch tags for several transactions in one query, keyed by transaction_id"""
+        ids = list({str(transaction_id) for transaction_id in transaction_ids})
+        if not ids:
+            return {}
+        
+        result = await execute(self.db.table("transaction_tags").select(
+            "transaction_id, tags(tag_id, value)"
+        ).in_("transaction_id", ids))
         
-        tags = []
+        tags_by_transaction: Dict[str, List[TagResponse]] = {}
         for item in result.data:
             if item.get("tags"):
-                tags.append(TagResponse(**item["tags"]))
-        
-        return tags
\ No newline at end of file
+                tags_by_transaction.setdefault(item["transaction_id"], []).append(
+                    TagResponse.model_validate(item["tags"])
+                )
+        return tags_by_transaction
\ No newline at end of file
@@ -1,8 +1,20 @@
 import uuid
+import orjson
 from typing import List, Optional
 from datetime import datetime, timezone
+from pydantic import TypeAdapter
 from supabase import Client
-from app.core.models.models import TransactionCreate, TransactionUpdate, TransactionResponse, TransactionWithTags, TagResponse
+from app.core.database.query import execute
+from app.core.database.pool import get_db_pool
+from app.core.models.models import TransactionCreate, TransactionUpdate, TransactionResponse, TransactionWithTags
+
+_transaction_list = TypeAdapter(List[TransactionResponse])
+
+# Timestamps are rendered through JSON so they match PostgREST's ISO strings
+_TRANSACTION_COLUMNS = (
+    "transaction_id, date, amount, merchant, category_id, is_recurring, notes, "
+    "to_json(created_at) #>> '{}' AS created_at, to_json(updated_at) #>> '{}' AS updated_at"
+)
 
 
 class TransactionRepository:
@@ -30,41 +42,69 @@ class TransactionRepository:
             "updated_at": now
         }
         
-        result = self.db.table("transactions").insert(data).execute()
-        return TransactionResponse(**result.data[0])
+        result = await execute(self.db.table("transactions").insert(data))
+        return TransactionResponse.model_validate(result.data[0])
 
 
     async def get_transaction(self, transaction_id: str) -> Optional[TransactionResponse]:
-        result = self.db.table("transactions").select("*").eq("transaction_id", transaction_id).execute()
+        result = await execute(self.db.table("transactions").select("*").eq("transaction_id", transaction_id))
         if result.data:
-            return TransactionResponse(**result.data[0])
+            return TransactionResponse.model_validate(result.data[0])
         return None
 
 
     async def get_transactions(self, skip: int = 0, limit: int = 100, category_id: Optional[str] = None) -> List[TransactionResponse]:
+        pool = await get_db_pool()
+        if pool:
+            rows = await pool.fetch(
+                f"SELECT {_TRANSACTION_COLUMNS} FROM transactions"
+                " WHERE ($1::uuid IS NULL OR category_id = $1::uuid)"
+                " ORDER BY date DESC OFFSET $2 LIMIT $3",
+                category_id, skip, limit
+            )
+            return _transaction_list.validate_python([dict(row) for row in rows])
+        
         query = self.db.table("transactions").select("*")
         if category_id:
             query = query.eq("category_id", category_id)
         
-        result = query.order("date", desc=True).range(skip, skip + limit - 1).execute()
-        return [TransactionResponse(**item) for item in result.data]
+        result = await execute(query.order("date", desc=True).range(skip, skip + limit - 1))
+        return _transaction_list.validate_python(result.data)
 
 
     async def get_transaction_with_tags(self, transaction_id: str) -> Optional[TransactionWithTags]:
-        transaction = await self.get_transaction(transaction_id)
-        if not transaction:
-            return None
-        
-        tags_result = self.db.table("transaction_tags").select(
-            "tags(tag_id, value)"
-        ).eq("transaction_id", transaction_id).execute()
+        pool = await get_db_pool()
+        if pool:
+            row = await pool.fetchrow(
+                f"SELECT {_TRANSACTION_COLUMNS},"
+                " (SELECT c.name FROM categories c WHERE c.category_id = transactions.category_id) AS category_name,"
+                " (SELECT COALESCE(json_agg(json_build_object('tag_id', g.tag_id, 'value', g.value)), '[]')"
+                "  FROM transaction_tags tt JOIN tags g ON g.tag_id = tt.tag_id"
+                "  WHERE tt.transaction_id = transactions.transaction_id) AS tags"
+                " FROM transactions WHERE transaction_id = $1::uuid",
+                transaction_id
+            )
+            if not row:
+                return None
+            return TransactionWithTags.model_validate({**dict(row), "tags": orjson.loads(row["tags"])})
         
-        tags = []
-        for item in tags_result.data:
-            if item.get("tags"):
-                tags.append(TagResponse(**item["tags"]))
+        # Embed the category name and tags so the whole view is one request
+        result = await execute(self.db.table("transactions").select(
+            "*, categories(name), transaction_tags(tags(tag_id, value))"
+        ).eq("transaction_id", transaction_id))
+        if not result.data:
+            return None
         
-        return TransactionWithTags(**transaction.dict(), tags=tags)
+        # Validate the row and its tags in one pass instead of building a
+        # TransactionResponse only to dump and re-validate it
+        data = result.data[0]
+        category = data.pop("categories", None)
+        links = data.pop("transaction_tags", None) or []
+        return TransactionWithTags.model_validate({
+            **data,
+            "category_name": category["name"] if category else None,
+            "tags": [item["tags"] for item in links if item.get("tags")]
+        })
 
 
     async def update_transaction(self, transaction_id: str, transaction_update: TransactionUpdate) -> Optional[TransactionResponse]:
@@ -86,12 +126,32 @@ class TransactionRepository:
         if transaction_update.notes is not None:
             update_data["notes"] = transaction_update.notes
         
-        result = self.db.table("transactions").update(update_data).eq("transaction_id", transaction_id).execute()
+        result = await execute(self.db.table("transactions").update(update_data).eq("transaction_id", transaction_id))
         if result.data:
-            return TransactionResponse(**result.data[0])
+            return TransactionResponse.model_validate(result.data[0])
         return None
 
 
     async def delete_transaction(self, transaction_id: str) -> bool:
-        result = self.db.table("transactions").delete().eq("transaction_id", transaction_id).execute()
-        return len(result.data) > 0
\ No newline at end of file
+        result = await execute(self.db.table("transactions").delete().eq("transaction_id", transaction_id))
+        return len(result.data) > 0
+
+
+    async def get_spending_summary(self, start_date: datetime, end_date: datetime, category_id: Optional[str] = None) -> dict:
+        pool = await get_db_pool()
+        if pool:
+            summary = await pool.fetchval(
+                "SELECT spending_summary($1, $2, $3::uuid)",
+                start_date, end_date, category_id
+            )
+            return orjson.loads(summary) if summary else {}
+        
+        result = await execute(self.db.rpc(
+            "spending_summary",
+            {
+                "p_start_date": start_date.isoformat(),
+                "p_end_date": end_date.isoformat(),
+                "p_category_id": category_id
+            }
+        ))
+        return result.data or {}
\ No newline at end of file
@@ -2,15 +2,78 @@
 Free intelligent transaction categorization service using local embeddings and rule-based logic
 """
 import json
-from typing import List, Optional, Tuple, Dict
+import logging
+import re
+import string
+from typing import List, Optional, Tuple, Dict, Union
 from decimal import Decimal
 from datetime import datetime
 import uuid
 
 from supabase import Client
-from app.core.services.embeddings_free import FreeEmbeddingService
+from app.core.database.query import execute
+from app.core.services.embeddings_free import FreeEmbeddingService, to_pgvector_literal
 from app.core.repositories.category_repository import CategoryRepository
-from app.core.models.models import TransactionResponse
+from app.core.models.models import CategoryResponse, TransactionCreate, TransactionResponse
+from app.shared.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# The rule fallback resolves names against a cached snapshot of categories
+CATEGORY_NAMES_TTL = 300  # seconds
+
+
+# Fallback rules: (keywords, category name, confidence), checked in order
+RULES = [
+    # Food & Dining rules
+    (["restaurant", "cafe", "coffee", "starbucks", "pizza", "burger", "food"], 
+     "Food & Dining", 0.8),
+    (["swiggy", "zomato", "uber eats"], 
+     "Food & Dining", 0.9),
+
+    # Transportation rules
+    (["uber", "ola", "taxi", "cab", "lyft"], 
+     "Transportation", 0.9),
+    (["petrol", "fuel", "gas station", "indian oil", "bharat petroleum"], 
+     "Transportation", 0.85),
+
+    # Shopping rules
+    (["amazon", "flipkart", "myntra", "ajio", "store", "mart", "mall"], 
+     "Shopping", 0.8),
+
+    # Bills & Utilities
+    (["electricity", "water", "gas", "internet", "broadband", "mobile", "phone"], 
+     "Bills & Utilities", 0.9),
+
+    # Entertainment
+    (["netflix", "spotify", "prime video", "hotstar", "movie", "cinema"], 
+     "Entertainment", 0.9),
+
+    # Health & Wellness
+    (["pharmacy", "medical", "doctor", "hospital", "clinic", "medicine", "lab", "labs", "test", "covid", "diagnostic", "scan", "xray", "x-ray"], 
+     "Health & Wellness", 0.85),
+    (["gym", "fitness", "yoga"], 
+     "Health & Wellness", 0.8),
+]
+
+# Punctuation reads as a word break, so "Uber-Eats" and "x-ray" match
+_NORMALIZE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+def _normalize_merchant(text: str) -> str:
+    """Lowercase, turn punctuation into spaces and collapse whitespace"""
+    return " ".join(text.lower().translate(_NORMALIZE).split())
+
+
+# All rules in one pattern: one optional lookahead per rule, each scanning
+# the whole merchant, so a single match reports every rule that fires
+# (group i is set when rule i matched), in rule order.
+_KEYWORD_RE = re.compile("".join(
+    "(?:(?=.*?(" + "|".join(
+        re.escape(keyword) for keyword in dict.fromkeys(_normalize_merchant(k) for k in keywords)
+    ) + ")))?"
+    for keywords, _, _ in RULES
+))
 
 
 class CategorizationService:
@@ -21,7 +84,9 @@ class CategorizationService:
         self.category_repo = category_repo
         self.embedding_service = FreeEmbeddingService()
         self.similarity_threshold = 0.7
+        self.exact_match_threshold = 0.85
         self.top_k = 5
+        self._category_names = TTLCache(maxsize=1, ttl=CATEGORY_NAMES_TTL)
         
     async def find_similar_transactions(
         self,
@@ -37,34 +102,64 @@ class CategorizationService:
         query_embedding = await self.embedding_service.generate_embedding(transaction_text)
         
         # Convert to PostgreSQL array format
-        embedding_str = f"[{','.join(map(str, query_embedding))}]"
+        embedding_str = to_pgvector_literal(query_embedding)
         
         # Call the stored function to find similar transactions
         try:
-            result = self.db.rpc(
+            result = await execute(self.db.rpc(
                 "find_similar_transactions",
                 {
                     "query_embedding": embedding_str,
                     "limit_count": limit,
                     "similarity_threshold": self.similarity_threshold
                 }
-            ).execute()
+            ))
             
             return result.data if result.data else []
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Failed to find similar transactions: {str(e)}")
             return []
     
+    async def find_similar_category(
+        self,
+        transaction_text: str,
+        limit: int = 5
+    ) -> Optional[Dict]:
+        """
+        Vote on a category from the most similar embedded transactions
+        
+        Returns a dict with category_id, category_name and confidence, or
+        None when nothing is similar enough
+        """
+        query_embedding = await self.embedding_service.generate_embedding(transaction_text)
+        
+        try:
+            result = await execute(self.db.rpc(
+                "find_similar_transaction_category",
+                {
+                    "query_embedding": to_pgvector_literal(query_embedding),
+                    "limit_count": limit,
+                    "similarity_threshold": self.similarity_threshold,
+                    "exact_match_threshold": self.exact_match_threshold
+                }
+            ))
+            
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Failed to find similar category: {str(e)}")
+            return None
+    
     async def categorize_transaction(
         self,
-        transaction: TransactionResponse,
+        transaction: Union[TransactionCreate, TransactionResponse],
         description: Optional[str] = None
     ) -> Tuple[Optional[uuid.UUID], Optional[str], float]:
         """
         Categorize a transaction using similarity search and rule-based logic
         
+        Only date, amount and merchant are used, so this also works on a
+        transaction that hasn't been saved yet.
+        
         Returns:
             Tuple of (category_id, category_name, confidence_score)
         """
@@ -76,60 +171,15 @@ class CategorizationService:
             description=description
         )
         
-        # Find similar transactions
-        similar_transactions = await self.find_similar_transactions(
-            transaction_text,
-            limit=self.top_k
-        )
-        
-        if not similar_transactions:
-            # No similar transactions found, use rule-based approach
-            return await self._rule_based_categorization(transaction)
-        
-        # Check if we have high confidence based on similarity
-        if similar_transactions[0]["similarity_score"] >= 0.85:
-            # Very similar transaction found, use its category
-            return (
-                similar_transactions[0]["confirmed_category_id"],
-                similar_transactions[0]["confirmed_category_name"],
-                similar_transactions[0]["similarity_score"]
-            )
-        
-        # Use weighted voting from similar transactions
-        category_votes = {}
-        total_weight = 0
-        
-        for tx in similar_transactions:
-            weight = tx["similarity_score"]
-            category_name = tx["confirmed_category_name"]
-            
-            if category_name in category_votes:
-                category_votes[category_name]["weight"] += weight
-                category_votes[category_name]["count"] += 1
-            else:
-                category_votes[category_name] = {
-                    "weight": weight,
-                    "count": 1,
-                    "category_id": tx["confirmed_category_id"]
-                }
-            
-            total_weight += weight
+        # Similarity search and weighted voting run in the database
+        match = await self.find_similar_category(transaction_text, limit=self.top_k)
         
-        # Find the most voted category
-        if category_votes:
-            best_category = max(category_votes.items(), key=lambda x: x[1]["weight"])
-            category_name = best_category[0]
-            category_info = best_category[1]
-            confidence = category_info["weight"] / total_weight
-            
-            # If confidence is still low, use rule-based as fallback
-            if confidence < 0.5:
-                return await self._rule_based_categorization(transaction)
-            
+        # If confidence is still low, use rule-based as fallback
+        if match and match["confidence"] >= 0.5:
             return (
-                category_info["category_id"],
-                category_name,
-                confidence
+                match["category_id"],
+                match["category_name"],
+                match["confidence"]
             )
         
         # Fallback to rule-based
@@ -137,59 +187,37 @@ class CategorizationService:
     
     async def _rule_based_categorization(
         self,
-        transaction: TransactionResponse
+        transaction: Union[TransactionCreate, TransactionResponse]
     ) -> Tuple[Optional[uuid.UUID], Optional[str], float]:
         """
         Rule-based categorization as fallback
         """
-        merchant_lower = transaction.merchant.lower() if transaction.merchant else ""
-        amount = float(transaction.amount)
+        merchant_key = _normalize_merchant(transaction.merchant or "")
         
-        # Define rules with confidence scores
-        rules = [
-            # Food & Dining rules
-            (["restaurant", "cafe", "coffee", "starbucks", "pizza", "burger", "food"], 
-             "Food & Dining", 0.8),
-            (["swiggy", "zomato", "uber eats"], 
-             "Food & Dining", 0.9),
-            
-            # Transportation rules
-            (["uber", "ola", "taxi", "cab", "lyft"], 
-             "Transportation", 0.9),
-            (["petrol", "fuel", "gas station", "indian oil", "bharat petroleum"], 
-             "Transportation", 0.85),
-            
-            # Shopping rules
-            (["amazon", "flipkart", "myntra", "ajio", "store", "mart", "mall"], 
-             "Shopping", 0.8),
-            
-            # Bills & Utilities
-            (["electricity", "water", "gas", "internet", "broadband", "mobile", "phone"], 
-             "Bills & Utilities", 0.9),
-            
-            # Entertainment
-            (["netflix", "spotify", "prime video", "hotstar", "movie", "cinema"], 
-             "Entertainment", 0.9),
-            
-            # Health & Wellness
-            (["pharmacy", "medical", "doctor", "hospital", "clinic", "medicine", "lab", "labs", "test", "covid", "diagnostic", "scan", "xray", "x-ray"], 
-             "Health & Wellness", 0.85),
-            (["gym", "fitness", "yoga"], 
-             "Health & Wellness", 0.8),
-        ]
-        
-        # Check each rule
-        for keywords, category_name, confidence in rules:
-            if any(keyword in merchant_lower for keyword in keywords):
-                # Find category in database
-                all_categories = await self.category_repo.get_categories(0, 1000)
-                for cat in all_categories:
-                    if cat.name == category_name:
-                        return cat.category_id, cat.name, confidence
+        # One match finds every rule that fires; try them in rule order so a
+        # missing category falls through to the next rule
+        groups = _KEYWORD_RE.match(merchant_key).groups()
+        matched = [index for index, group in enumerate(groups) if group is not None]
+        if matched:
+            categories_by_name = await self._get_categories_by_name()
+            for index in matched:
+                _, category_name, confidence = RULES[index]
+                cat = categories_by_name.get(category_name)
+                if cat:
+                    return cat.category_id, cat.name, confidence
         
         # No rule matched
         return None, None, 0.0
     
+    async def _get_categories_by_name(self) -> Dict[str, CategoryResponse]:
+        """Active categories keyed by exact name, refetched after the TTL"""
+        categories_by_name = self._category_names.get("all")
+        if categories_by_name is None:
+            all_categories = await self.category_repo.get_categories(0, 1000)
+            categories_by_name = {cat.name: cat for cat in all_categories}
+            self._category_names.set("all", categories_by_name)
+        return categories_by_name
+    
     async def store_transaction_embedding(
         self,
         transaction_id: uuid.UUID,
@@ -205,11 +233,11 @@ class CategorizationService:
         embedding = await self.embedding_service.generate_embedding(transaction_text)
         
         # Convert to PostgreSQL array format
-        embedding_str = f"[{','.join(map(str, embedding))}]"
+        embedding_str = to_pgvector_literal(embedding)
         
         # Upsert the embedding
         try:
-            result = self.db.rpc(
+            result = await execute(self.db.rpc(
                 "upsert_transaction_embedding",
                 {
                     "p_transaction_id": str(transaction_id),
@@ -219,16 +247,52 @@ class CategorizationService:
                     "p_category_name": category_name,
                     "p_confidence_score": confidence_score
                 }
-            ).execute()
+            ))
             
             return uuid.UUID(result.data) if result.data else None
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Failed to upsert transaction embedding: {str(e)}")
             logger.error(f"Transaction ID: {transaction_id}, Category: {category_name}")
             raise
     
+    async def store_transaction_embeddings_batch(self, items: List[Dict]) -> int:
+        """
+        Store or update embeddings for several transactions in one RPC
+        
+        Each item has transaction_id, transaction_text, category_id,
+        category_name and optionally confidence_score. Returns the number
+        of rows written.
+        """
+        # A transaction can only be upserted once per statement, last one wins
+        items = list({str(item["transaction_id"]): item for item in items}.values())
+        if not items:
+            return 0
+        
+        embeddings = await self.embedding_service.generate_embeddings(
+            [item["transaction_text"] for item in items]
+        )
+        rows = [
+            {
+                "transaction_id": str(item["transaction_id"]),
+                "transaction_text": item["transaction_text"],
+                "embedding": to_pgvector_literal(embedding),
+                "category_id": str(item["category_id"]),
+                "category_name": item["category_name"],
+                "confidence_score": item.get("confidence_score")
+            }
+            for item, embedding in zip(items, embeddings)
+        ]
+        
+        try:
+            result = await execute(self.db.rpc(
+                "upsert_transaction_embeddings_batch",
+                {"p_rows": rows}
+            ))
+            return result.data or 0
+        except Exception as e:
+            logger.error(f"Failed to upsert {len(rows)} transaction embeddings: {str(e)}")
+            raise
+    
     async def learn_from_feedback(
         self,
         transaction: TransactionResponse,
@@ -1,11 +1,26 @@
-from typing import List, Optional
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
 from app.core.repositories.category_repository import CategoryRepository
 from app.core.models.models import CategoryCreate, CategoryUpdate, CategoryResponse
+from app.shared.cache import TwoTierCache
+
+# Categories are reference data that rarely change
+CATEGORY_CACHE_TRANSIENT_SIZE = 128
+CATEGORY_CACHE_RESIDENT_SIZE = 4096
+CATEGORY_CACHE_TTL = 900  # seconds
 
 
 class CategoryService:
     def __init__(self, category_repo: CategoryRepository):
         self.category_repo = category_repo
+        self._category_cache = TwoTierCache(
+            transient_size=CATEGORY_CACHE_TRANSIENT_SIZE,
+            resident_size=CATEGORY_CACHE_RESIDENT_SIZE,
+            ttl=CATEGORY_CACHE_TTL
+        )
+        # Bumped by every write so reads that started before it don't cache
+        # what they fetched; a stale row could otherwise reach the resident tier
+        self._cache_generation = 0
 
     async def create_category(self, category_data: CategoryCreate) -> CategoryResponse:
         """Create a new category"""
@@ -20,11 +35,28 @@ class CategoryService:
             if not parent:
                 raise ValueError(f"Parent category {category_data.parent_category_id} not found")
         
-        return await self.category_repo.create_category(category_data)
+        category = await self.category_repo.create_category(category_data)
+        self._category_cache.set(str(category.category_id), category)
+        return category
 
     async def get_category(self, category_id: str) -> Optional[CategoryResponse]:
         """Get a single category by ID"""
-        return await self.category_repo.get_category(category_id)
+        key = str(category_id)
+        category = self._category_cache.get(key)
+        if category is None:
+            generation = self._cache_generation
+            category = await self.category_repo.get_category(key)
+            if category and generation == self._cache_generation:
+                self._category_cache.set(key, category)
+        return category
+
+    async def find_category_by_name(self, name: str) -> Optional[CategoryResponse]:
+        """Find an active category by name, ignoring case"""
+        return await self.category_repo.find_category_by_name(name)
+
+    async def get_categories_by_ids(self, category_ids: Iterable[str]) -> Dict[str, CategoryResponse]:
+        """Get several categories by ID, keyed by category ID"""
+        return await self.category_repo.get_categories_by_ids(category_ids)
 
     async def get_categories(self, skip: int = 0, limit: int = 100, active_only: bool = True) -> List[CategoryResponse]:
         """Get a list of categories"""
@@ -49,35 +81,51 @@ class CategoryService:
             if not parent:
                 raise ValueError(f"Parent category {category_update.parent_category_id} not found")
         
-        return await self.category_repo.update_category(category_id, category_update)
+        # Invalidate only once the write has finished, even if it failed, so
+        # a read racing the write can't put the old row back afterwards
+        key = str(category_id)
+        category = None
+        try:
+            category = await self.category_repo.update_category(category_id, category_update)
+        finally:
+            self._invalidate(key)
+        if category:
+            self._category_cache.set(key, category)
+        return category
 
     async def delete_category(self, category_id: str) -> bool:
         """Soft delete a category (set is_active to False)"""
-        return await self.category_repo.delete_category(category_id)
+        try:
+            return await self.category_repo.delete_category(category_id)
+        finally:
+            self._invalidate(str(category_id))
+
+    def _invalidate(self, key: str) -> None:
+        """Drop a category from both cache tiers after a write"""
+        self._cache_generation += 1
+        self._category_cache.pop(key)
 
     async def get_category_hierarchy(self) -> List[dict]:
         """Get categories organized in a hierarchical structure"""
         all_categories = await self.category_repo.get_categories(skip=0, limit=1000, active_only=True)
         
-        # Build hierarchy
-        category_map = {str(cat.category_id): cat for cat in all_categories}
-        hierarchy = []
+        # Bucket children by parent in one pass instead of rescanning per root
+        children_by_parent = defaultdict(list)
+        for category in all_categories:
+            if category.parent_category_id is not None:
+                children_by_parent[category.parent_category_id].append({
+                    "category_id": str(category.category_id),
+                    "name": category.name
+                })
         
+        hierarchy = []
         for category in all_categories:
             if category.parent_category_id is None:
                 # Root category
-                cat_dict = {
+                hierarchy.append({
                     "category_id": str(category.category_id),
                     "name": category.name,
-                    "children": []
-                }
-                # Find children
-                for child in all_categories:
-                    if child.parent_category_id == category.category_id:
-                        cat_dict["children"].append({
-                            "category_id": str(child.category_id),
-                            "name": child.name
-                        })
-                hierarchy.append(cat_dict)
+                    "children": children_by_parent.get(category.category_id, [])
+                })
         
         return hierarchy
\ No newline at end of file
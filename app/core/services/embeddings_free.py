@@ -1,9 +1,15 @@
 """
 Free embedding service for transaction categorization using Sentence Transformers
 """
-from typing import List, Optional, Tuple
+import asyncio
+import functools
+import hashlib
+import orjson
+from typing import Dict, List, Optional, Tuple, Union
 from decimal import Decimal
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app.shared.cache import TTLCache
 try:
     import numpy as np
     from sentence_transformers import SentenceTransformer
@@ -13,6 +19,60 @@ except ImportError:
     np = None
     SentenceTransformer = None
 
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+    simsimd = None
+
+# Embeddings are deterministic for a given text, so the TTL only bounds staleness
+# if the model is swapped
+EMBEDDING_CACHE_SIZE = 1024
+EMBEDDING_CACHE_TTL = 3600  # seconds
+
+# Concurrent requests are coalesced into one encode call of up to this many
+# texts, waiting at most this long for a batch to fill
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_BATCH_WAIT = 0.005  # seconds
+
+# Encoding is CPU-bound and torch already uses every core, so a single worker
+# keeps it off the event loop without oversubscribing threads
+_encode_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embeddings")
+
+# This model is small (90MB) and works well for similarity search
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+@functools.lru_cache(maxsize=1)
+def _load_model(name: str) -> "SentenceTransformer":
+    """Load the model once per process; called from the encode worker thread"""
+    return SentenceTransformer(name)
+
+
+# Embeddings as float32 arrays, lists of floats, or raw float32 bytes
+VectorLike = Union[List[float], "np.ndarray", bytes, memoryview]
+
+
+def _as_float32(vector: VectorLike) -> "np.ndarray":
+    """View a vector as a float32 array, copying only when the input isn't one"""
+    if isinstance(vector, (bytes, memoryview)):
+        return np.frombuffer(vector, dtype=np.float32)
+    return np.asarray(vector, dtype=np.float32)
+
+
+def to_pgvector_literal(embedding: Union[List[float], "np.ndarray"]) -> str:
+    """
+    Format an embedding as a pgvector text literal, e.g. "[0.1,0.2]"
+    
+    pgvector stores float32, so values are cast first and orjson writes the
+    whole array with the shortest float32 repr in native code. That's about
+    half the characters of the float64 repr, with no precision lost, and a
+    JSON array is already valid pgvector input.
+    """
+    values = np.asarray(embedding, dtype=np.float32)
+    return orjson.dumps(values, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
 
 class FreeEmbeddingService:
     """Service for generating embeddings using free local models"""
@@ -21,9 +81,21 @@ class FreeEmbeddingService:
         """Initialize with a free, efficient model"""
         if not EMBEDDINGS_AVAILABLE:
             raise ImportError("numpy and sentence-transformers are required for embeddings. Install with: pip install numpy sentence-transformers")
-        # This model is small (90MB) and works well for similarity search
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Weights are loaded on first encode, off the event loop
+        self.model_name = EMBEDDING_MODEL_NAME
         self.embedding_dimension = 384  # This model outputs 384 dimensions
+        self._embedding_cache = TTLCache(maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL)
+        # Texts waiting to be encoded, keyed by digest so duplicates share a future
+        self._pending: Dict[bytes, Tuple[str, asyncio.Future]] = {}
+        # Batches taken off _pending but still encoding on the executor, so a
+        # duplicate arriving meanwhile waits on the same future
+        self._in_flight: Dict[bytes, asyncio.Future] = {}
+        self._batch_task: Optional[asyncio.Task] = None
+    
+    @property
+    def model(self) -> "SentenceTransformer":
+        """The shared model, loading it on first use (blocking)"""
+        return _load_model(self.model_name)
     
     def format_transaction_text(
         self,
@@ -38,23 +110,19 @@ class FreeEmbeddingService:
         
         Format: "YYYY-MM-DD│₹amount│merchant│description│category"
         """
-        # Format date
-        date_str = date.strftime("%Y-%m-%d")
-        
-        # Format amount with currency symbol
-        amount_str = f"₹{float(amount)}"
-        
-        # Clean merchant name
-        merchant_str = merchant.strip() if merchant else "Unknown"
+        # Build the text representation. The amount keeps the float repr
+        # ("₹100.0") so new texts line up with the ones already stored.
+        parts = [
+            f"{date.year:04d}-{date.month:02d}-{date.day:02d}",
+            f"₹{float(amount)}",
+            merchant.strip() if merchant else "Unknown"
+        ]
         
         # Include description if available
-        desc_str = description.strip() if description else ""
-        
-        # Build the text representation
-        parts = [date_str, amount_str, merchant_str]
-        
-        if desc_str:
-            parts.append(desc_str)
+        if description:
+            desc_str = description.strip()
+            if desc_str:
+                parts.append(desc_str)
         
         # Add category if provided (for training data)
         if category:
@@ -62,7 +130,7 @@ class FreeEmbeddingService:
         
         return "│".join(parts)
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str) -> "np.ndarray":
         """
         Generate embedding vector for the given text using local model
         
@@ -70,35 +138,116 @@ class FreeEmbeddingService:
             text: The text to embed
             
         Returns:
-            List of floats representing the embedding vector
+            float32 array holding the embedding vector
         """
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        cached = self._embedding_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        pending = self._pending.get(key)
+        if pending is not None:
+            future = pending[1]
+        elif key in self._in_flight:
+            future = self._in_flight[key]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = (text, future)
+            if self._batch_task is None:
+                self._batch_task = asyncio.create_task(self._encode_pending())
+        
+        # Shielded so one cancelled caller doesn't fail the others sharing it
+        return await asyncio.shield(future)
+    
+    async def generate_embeddings(self, texts: List[str]) -> List["np.ndarray"]:
+        """Generate embeddings for several texts, encoded in shared batches"""
+        return list(await asyncio.gather(*(self.generate_embedding(text) for text in texts)))
+    
+    async def _encode_pending(self) -> None:
+        """Encode queued texts in batches until the queue is empty"""
         try:
-            # Generate embedding (this runs locally, no API needed)
-            embedding = self.model.encode(text)
-            return embedding.tolist()
-        except Exception as e:
-            raise Exception(f"Failed to generate embedding: {str(e)}")
+            while self._pending:
+                if len(self._pending) < EMBEDDING_BATCH_SIZE:
+                    await asyncio.sleep(EMBEDDING_BATCH_WAIT)
+                
+                keys = list(self._pending)[:EMBEDDING_BATCH_SIZE]
+                batch = [(key, *self._pending.pop(key)) for key in keys]
+                for key, _, future in batch:
+                    self._in_flight[key] = future
+                try:
+                    # Generate embeddings (this runs locally, no API needed)
+                    encoded = await asyncio.get_running_loop().run_in_executor(
+                        _encode_executor,
+                        functools.partial(self._encode_sync, [text for _, text, _ in batch])
+                    )
+                except Exception as e:
+                    error = Exception(f"Failed to generate embedding: {str(e)}")
+                    for key, _, future in batch:
+                        del self._in_flight[key]
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                
+                for (key, _, future), embedding in zip(batch, encoded):
+                    self._embedding_cache.set(key, embedding)
+                    del self._in_flight[key]
+                    if not future.done():
+                        future.set_result(embedding)
+        finally:
+            # Entries remain only if this task was cancelled mid-batch; fail
+            # them so later duplicates don't wait on a future nobody resolves
+            for future in self._in_flight.values():
+                future.cancel()
+            self._in_flight.clear()
+            self._batch_task = None
+    
+    def _encode_sync(self, texts: List[str]) -> List["np.ndarray"]:
+        """Run the model on a batch; blocking, so only call from the executor"""
+        encoded = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        # Each row is copied into its own float32 array so a cached row doesn't
+        # keep its whole batch alive. They're shared through the cache, so
+        # make them read-only.
+        rows = [np.array(row, dtype=np.float32) for row in encoded]
+        for row in rows:
+            row.setflags(write=False)
+        return rows
     
-    def calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
+    def calculate_similarity(self, embedding1: "VectorLike", embedding2: "VectorLike") -> float:
         """
         Calculate cosine similarity between two embeddings
         
         Returns:
             Similarity score between 0 and 1 (1 being identical)
         """
-        vec1 = np.array(embedding1)
-        vec2 = np.array(embedding2)
+        vec1 = _as_float32(embedding1)
+        vec2 = _as_float32(embedding2)
         
-        # Cosine similarity
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+        # SIMD kernel when installed; it returns cosine distance, and 1.0 for
+        # a zero vector, so similarity is 0.0 as below
+        if SIMSIMD_AVAILABLE:
+            return 1.0 - float(simsimd.cosine(vec1, vec2))
         
-        if norm1 == 0 or norm2 == 0:
+        # Cosine similarity with a single sqrt; the combined denominator is
+        # zero exactly when either vector is
+        denom = np.sqrt(np.vdot(vec1, vec1) * np.vdot(vec2, vec2))
+        if denom == 0:
             return 0.0
         
-        dot_product = np.dot(vec1, vec2)
-        similarity = dot_product / (norm1 * norm2)
-        return float(similarity)
+        return float(np.dot(vec1, vec2) / denom)
+    
+    def pairwise_similarity(self, embeddings: List[List[float]]) -> "np.ndarray":
+        """
+        Cosine similarity between every pair of embeddings
+        
+        Returns:
+            An (N, N) float32 matrix from a single matrix multiply, so callers
+            don't loop over calculate_similarity
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Zero vectors stay zero and get similarity 0.0, as in calculate_similarity
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+        return np.clip(matrix @ matrix.T, -1.0, 1.0)
     
     def extract_transaction_details(self, transaction_text: str) -> dict:
         """
@@ -107,18 +256,20 @@ class FreeEmbeddingService:
         Returns dict with: date, amount, merchant, description
         """
         parts = transaction_text.split("│")
+        count = len(parts)
         
         details = {
-            "date": parts[0] if len(parts) > 0 else None,
-            "amount": parts[1].replace("₹", "") if len(parts) > 1 else None,
-            "merchant": parts[2] if len(parts) > 2 else None,
-            "description": parts[3] if len(parts) > 3 and "→" not in parts[3] else None,
+            "date": parts[0],
+            "amount": parts[1].replace("₹", "") if count > 1 else None,
+            "merchant": parts[2] if count > 2 else None,
+            "description": parts[3] if count > 3 and "→" not in parts[3] else None,
         }
         
-        # Extract category if present
-        for part in parts:
-            if "→" in part:
-                details["category"] = part.split("→")[1].strip()
-                break
+        # Extract category if present; most texts have none, so skip the scan
+        if "→" in transaction_text:
+            for part in parts:
+                if "→" in part:
+                    details["category"] = part.split("→", 2)[1].strip()
+                    break
         
         return details
\ No newline at end of file
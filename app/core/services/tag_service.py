@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 import uuid
 from app.core.repositories.tag_repository import TagRepository
 from app.core.models.models import TagCreate, TagResponse, TransactionTagCreate
@@ -50,15 +50,54 @@ class TagService:
         """Remove a tag from a transaction"""
         return await self.tag_repo.remove_tag_from_transaction(transaction_id, tag_id)
 
+    async def set_transaction_tags(self, transaction_id: str, values: List[str]) -> List[TagResponse]:
+        """Replace a transaction's tags, only touching the links that change"""
+        tags = await self.get_or_create_tags(values)
+        await self.tag_repo.replace_transaction_tags(
+            transaction_id, list({str(tag.tag_id) for tag in tags})
+        )
+        
+        return tags
+
     async def get_transaction_tags(self, transaction_id: str) -> List[TagResponse]:
         """Get all tags for a transaction"""
         return await self.tag_repo.get_transaction_tags(transaction_id)
 
+    async def get_tags_for_transactions(self, transaction_ids: Iterable[str]) -> Dict[str, List[TagResponse]]:
+        """Get tags for several transactions, keyed by transaction ID"""
+        return await self.tag_repo.get_tags_for_transactions(transaction_ids)
+
     async def get_or_create_tag(self, value: str) -> TagResponse:
         """Get an existing tag or create it if it doesn't exist"""
-        existing = await self.tag_repo.get_tag_by_value(value)
-        if existing:
-            return existing
+        # The RPC inserts whatever it's given, so enforce the tag length limits here
+        return await self.tag_repo.get_or_create_tag(TagCreate(value=value).value)
+
+    async def get_or_create_tags(self, values: List[str]) -> List[TagResponse]:
+        """Get existing tags by value and create the missing ones in a single insert"""
+        values = list(dict.fromkeys(values))
+        if not values:
+            return []
+        
+        tags = await self.tag_repo.get_tags_by_values(values)
+        existing_values = {tag.value for tag in tags}
+        missing = [TagCreate(value=value) for value in values if value not in existing_values]
+        if missing:
+            tags.extend(await self.tag_repo.create_tags(missing))
+        
+        return tags
+
+    async def attach_tags(self, transaction_id: str, values: List[str]) -> List[TagResponse]:
+        """Attach tags to a transaction by value, creating any that don't exist"""
+        # The RPC inserts whatever it's given, so enforce the tag length limits here
+        values = list(dict.fromkeys(TagCreate(value=value).value for value in values))
+        if not values:
+            return []
+        
+        return await self.tag_repo.attach_tags(transaction_id, values)
+
+    async def add_tags_to_transaction(self, transaction_id: str, tag_ids: List[str]) -> bool:
+        """Attach several existing tags to a transaction in a single insert"""
+        if not tag_ids:
+            return False
         
-        tag_data = TagCreate(value=value)
-        return await self.tag_repo.create_tag(tag_data)
\ No newline at end of file
+        return await self.tag_repo.add_tags_to_transaction(transaction_id, tag_ids)
\ No newline at end of file
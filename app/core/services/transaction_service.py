@@ -1,6 +1,5 @@
 from typing import List, Optional
-from datetime import datetime, timedelta
-from decimal import Decimal
+from datetime import datetime, timedelta, timezone
 import uuid
 from app.core.repositories.transaction_repository import TransactionRepository
 from app.core.repositories.category_repository import CategoryRepository
@@ -54,7 +53,7 @@ class TransactionService:
     async def get_spending_summary(self, period: str = "month", category_id: Optional[str] = None) -> dict:
         """Get spending summary for a period"""
         # Determine date range based on period
-        end_date = datetime.now()
+        end_date = datetime.now(timezone.utc)
         if period == "week":
             start_date = end_date - timedelta(days=7)
         elif period == "month":
@@ -64,48 +63,24 @@ class TransactionService:
         else:
             start_date = end_date - timedelta(days=30)  # Default to month
 
-        # Get transactions in date range
-        transactions = await self.transaction_repo.get_transactions(skip=0, limit=1000, category_id=category_id)
-        
-        # Get all unique category IDs
-        category_ids = set()
-        for transaction in transactions:
-            if transaction.category_id and start_date <= transaction.date <= end_date:
-                category_ids.add(str(transaction.category_id))
-        
-        # Fetch all categories at once
-        category_map = {}
-        for cat_id in category_ids:
-            category = await self.category_repo.get_category(cat_id)
-            if category:
-                category_map[cat_id] = category.name
-        
-        # Filter by date and calculate summary
-        total = Decimal(0)
-        count = 0
-        category_totals = {}
-        
-        for transaction in transactions:
-            if start_date <= transaction.date <= end_date:
-                total += transaction.amount
-                count += 1
-                
-                if transaction.category_id:
-                    cat_id_str = str(transaction.category_id)
-                    if cat_id_str in category_map:
-                        category_name = category_map[cat_id_str]
-                        if category_name not in category_totals:
-                            category_totals[category_name] = Decimal(0)
-                        category_totals[category_name] += transaction.amount
+        # Aggregate in the database instead of summing transactions here
+        summary = await self.transaction_repo.get_spending_summary(start_date, end_date, category_id)
+        total = float(summary.get("total_spent") or 0)
+        count = summary.get("transaction_count") or 0
+        top_category = summary.get("top_category")
 
         return {
             "period": period,
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat(),
-            "total_spent": float(total),
+            "total_spent": total,
             "transaction_count": count,
-            "average_transaction": float(total / count) if count > 0 else 0,
-            "category_breakdown": {k: float(v) for k, v in category_totals.items()}
+            "average_transaction": total / count if count > 0 else 0,
+            "category_breakdown": {k: float(v) for k, v in (summary.get("category_breakdown") or {}).items()},
+            "top_category": {
+                "name": top_category["name"],
+                "total": float(top_category["total"])
+            } if top_category else None
         }
 
     async def add_tags_to_transaction(self, transaction_id: str, tag_ids: List[str]) -> TransactionWithTags:
@@ -2,15 +2,18 @@
 JWT Authentication service for Supabase integration
 """
 import os
+import hashlib
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone
-from jose import jwt, JWTError
+import jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import Client, create_client
+from supabase import Client
+from app.core.database.connection import create_supabase_client
 from app.core.models.auth_models import UserInfo, TokenResponse, LoginRequest, RefreshTokenRequest
 from app.shared.config import get_settings
+from app.shared.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +23,10 @@ security = HTTPBearer(auto_error=False)
 # Get settings
 settings = get_settings()
 
+# Verified tokens are trusted for at most this long before being re-checked
+TOKEN_CACHE_TTL = 300  # seconds
+TOKEN_CACHE_SIZE = 1024
+
 
 class SupabaseAuthService:
     """Supabase authentication service with JWT handling"""
@@ -29,14 +36,19 @@ class SupabaseAuthService:
         if not settings.effective_supabase_url or not settings.effective_supabase_key:
             raise ValueError("Supabase URL and key must be configured for authentication")
         
-        self.supabase: Client = create_client(
-            settings.effective_supabase_url, 
+        # Separate client so auth session state never leaks into the data
+        # client, but over the same pooled connections
+        self.supabase: Client = create_supabase_client(
+            settings.effective_supabase_url,
             settings.effective_supabase_key
         )
         
-        # JWT settings
-        self.jwt_secret = settings.effective_supabase_key
+        # JWT settings (the project's JWT secret, not the anon key)
+        self.jwt_secret = settings.supabase_jwt_secret
         self.jwt_algorithm = "HS256"
+        
+        # Token digest -> UserInfo for recently verified tokens
+        self._token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
     
     async def authenticate_user(self, email: str, password: str) -> TokenResponse:
         """Authenticate user with email and password"""
@@ -92,25 +104,24 @@ class SupabaseAuthService:
     
     async def verify_token(self, token: str) -> UserInfo:
         """Verify JWT token and extract user information"""
+        cache_key = _token_digest(token)
+        cached = self._token_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # For Supabase tokens, we can decode without verification
-            # since Supabase already verified them when issued
-            # The anon key is not the JWT secret, so we skip signature verification
-            import json
-            import base64
-            
-            # Split the JWT token
-            parts = token.split('.')
-            if len(parts) != 3:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid token format"
+            if self.jwt_secret:
+                # Verify the HS256 signature with the project's JWT secret
+                payload = jwt.decode(
+                    token,
+                    self.jwt_secret,
+                    algorithms=[self.jwt_algorithm],
+                    options={"verify_aud": False}
                 )
-            
-            # Decode the payload (add padding if needed)
-            payload_data = parts[1]
-            payload_data += '=' * (4 - len(payload_data) % 4)
-            payload = json.loads(base64.urlsafe_b64decode(payload_data))
+            else:
+                # Without the JWT secret we can only read the claims;
+                # Supabase already verified the token when it was issued
+                payload = jwt.decode(token, options={"verify_signature": False})
             
             # Extract user information from the payload
             user_id = payload.get("sub")
@@ -130,7 +141,7 @@ class SupabaseAuthService:
                     detail="Token expired"
                 )
             
-            return UserInfo(
+            user = UserInfo(
                 id=user_id,
                 email=email,
                 role=payload.get("role"),
@@ -141,8 +152,23 @@ class SupabaseAuthService:
                 sub=user_id
             )
             
+            # Never cache past the token's own expiry
+            ttl = min(TOKEN_CACHE_TTL, exp - datetime.now(timezone.utc).timestamp())
+            self._token_cache.set(cache_key, user, ttl=ttl)
+            return user
+            
         except HTTPException:
             raise
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token expired"
+            )
+        except jwt.InvalidTokenError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token"
+            )
         except Exception as e:
             logger.error(f"Token verification error: {str(e)}, type: {type(e)}")
             raise HTTPException(
@@ -181,8 +207,13 @@ class SupabaseAuthService:
                 detail="User registration failed"
             )
     
+    def invalidate_token(self, token: str) -> None:
+        """Forget a cached token verification"""
+        self._token_cache.pop(_token_digest(token))
+    
     async def sign_out(self, token: str) -> bool:
         """Sign out user"""
+        self.invalidate_token(token)
         try:
             self.supabase.auth.sign_out(token)
             return True
@@ -191,6 +222,11 @@ class SupabaseAuthService:
             return False
 
 
+def _token_digest(token: str) -> bytes:
+    """Hash a bearer token so raw tokens are not kept as cache keys"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
 # Global auth service instance
 _auth_service: Optional[SupabaseAuthService] = None
 
@@ -3,16 +3,92 @@ Gemini AI service with persistent MCP integration
 Uses application-level MCP connection management
 """
 import os
+import time
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional, AsyncIterator
+import httpx
 from google import genai
-from app.servers.gemini.integrations.mcp_connection_manager import get_mcp_manager
+from app.servers.gemini.integrations.mcp_connection_manager import get_mcp_pool
+from app.shared.cache import TTLCache
+from app.core.models.chat_models import ChatMessage
 
 logger = logging.getLogger(__name__)
 
 # Suppress INFO logs from google_genai.models
 # logging.getLogger('google_genai.models').setLevel(logging.WARNING)
 
+# Memory bounds for in-process conversations
+MAX_SESSIONS = 1000
+MAX_TURNS = 50
+SESSION_IDLE_TTL = 30 * 60  # seconds
+
+# Exact-match response cache. Only turns that used no tools, or only
+# read-only tools, are cached, and any write clears the cache.
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 60  # seconds
+READ_ONLY_TOOLS = frozenset({
+    "get_spending_summary",
+    "get_available_categories",
+    "get_recent_transactions",
+})
+
+
+class _ChatSession:
+    """Gemini chat plus the display transcript for one session"""
+    __slots__ = ("chat", "history", "turns", "last_access", "prefix_digest")
+    
+    def __init__(self, chat):
+        self.chat = chat
+        # Two messages (user + assistant) per turn
+        self.history: deque = deque(maxlen=MAX_TURNS * 2)
+        self.turns = 0
+        self.last_access = time.monotonic()
+        # Rolling hash of the conversation so far, used as the cache key prefix
+        self.prefix_digest = b""
+
+
+def _function_result_text(response: Any) -> str:
+    """Pull the first text block out of an MCP tool result, if there is one"""
+    if not isinstance(response, dict):
+        return ""
+    content = getattr(response.get("result"), "content", None)
+    if not content:
+        return ""
+    return getattr(content[0], "text", None) or ""
+
+
+def _extract_function_calls(history) -> List[Dict[str, Any]]:
+    """Summarize the tool calls and results from an automatic function calling history"""
+    function_calls = []
+    for call in history or ():
+        if not call.parts:
+            continue
+        part = call.parts[0]
+        
+        # Process function call
+        fc = part.function_call
+        if fc:
+            function_calls.append({
+                "type": "call",
+                "name": fc.name,
+                "args": fc.args or {}
+            })
+            logger.debug("Function call: %s with args: %s", fc.name, fc.args)
+            continue
+        
+        # Process function response
+        fr = part.function_response
+        if fr:
+            result_text = _function_result_text(fr.response) or str(fr.response)
+            function_calls.append({
+                "type": "response",
+                "result": result_text
+            })
+            logger.debug("Function response: %s", result_text)
+    return function_calls
+
 
 class GeminiMCPService:
     """Gemini chat service using persistent MCP connections"""
@@ -23,91 +99,81 @@ class GeminiMCPService:
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
-        self.client = genai.Client(api_key=api_key)
+        # Keep warm HTTP/2 connections to the Gemini API so concurrent turns
+        # multiplex over them instead of opening new TLS sessions under burst
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=genai.types.HttpOptions(
+                async_client_args={
+                    "http2": True,
+                    "limits": httpx.Limits(max_connections=128, max_keepalive_connections=64),
+                }
+            )
+        )
         self.model = "gemini-2.0-flash"
         
-        # Store conversation history
-        self.conversations: Dict[str, List[Dict[str, Any]]] = {}
+        # One Gemini chat per session keeps its own history, so each turn only
+        # appends the new message instead of rebuilding the whole transcript.
+        # Ordered by last access so the least recently used session is evicted
+        # first once MAX_SESSIONS is reached.
+        self.sessions: "OrderedDict[str, _ChatSession]" = OrderedDict()
+        
+        # Get the MCP connection pool
+        self.mcp_pool = get_mcp_pool()
         
-        # Get the MCP connection manager
-        self.mcp_manager = get_mcp_manager()
+        # Responses keyed by (conversation prefix, message). Messages carry the
+        # user's email, so entries are never shared between users.
+        self.response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
     
     async def send_message(self, session_id: str, message: str) -> Dict[str, Any]:
         """Send message to Gemini with MCP tools using persistent connection"""
         
-        # Initialize conversation history if new session
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
+        session = self._get_or_create_session(session_id)
+        chat = session.chat
+        
+        cache_key = (session.prefix_digest, message)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            response_text, function_calls = cached
+            # Replay the turn into the chat through its public history so the
+            # model still sees it on the next uncached message
+            session.chat = self.client.aio.chats.create(
+                model=self.model,
+                history=[
+                    *chat.get_history(),
+                    genai.types.UserContent(parts=[genai.types.Part(text=message)]),
+                    genai.types.ModelContent(parts=[genai.types.Part(text=response_text)]),
+                ]
+            )
+            self._record_turn(session, message, response_text, function_calls)
+            return {
+                "response": response_text,
+                "function_calls": function_calls,
+                "session_id": session_id
+            }
         
         try:
             response_text = ""
             function_calls = []
             
-            # Use the persistent MCP session
-            async with self.mcp_manager.get_session() as mcp_session:
+            # Borrow a persistent MCP session from the pool
+            async with self.mcp_pool.get_connection() as mcp_session:
                 # Configure Gemini with MCP session
                 config = genai.types.GenerateContentConfig(
                     temperature=0,
                     tools=[mcp_session],  # Use the persistent session
                 )
                 
-                # Create chat with existing history
-                chat = self.client.aio.chats.create(
-                    model=self.model, 
-                    config=config,
-                    history=self._convert_history_to_gemini_format(
-                        self.conversations[session_id]
-                    )
-                )
-                
-                # Send the message and get response
-                response = await chat.send_message(message)
+                # Send the message on the session's chat; the MCP session can
+                # differ between turns, so the config is passed per call
+                response = await chat.send_message(message, config=config)
                 response_text = response.text
                 
-                # Process function calls
-                if hasattr(response, 'automatic_function_calling_history') and len(response.automatic_function_calling_history) > 0:
-                    for call in response.automatic_function_calling_history:
-                        if call.parts and len(call.parts) > 0:
-                            part = call.parts[0]
-                            
-                            # Process function call
-                            if hasattr(part, 'function_call') and part.function_call:
-                                fc = part.function_call
-                                function_calls.append({
-                                    "type": "call",
-                                    "name": fc.name,
-                                    "args": dict(fc.args) if fc.args else {}
-                                })
-                                logger.info(f"Function call: {fc.name} with args: {fc.args}")
-                            
-                            # Process function response
-                            elif hasattr(part, 'function_response') and part.function_response:
-                                fr = part.function_response
-                                result_text = ""
-                                
-                                # Extract result text if available
-                                if isinstance(fr.response, dict) and 'result' in fr.response:
-                                    result = fr.response['result']
-                                    if hasattr(result, 'content') and result.content:
-                                        if len(result.content) > 0 and hasattr(result.content[0], 'text'):
-                                            result_text = result.content[0].text
-                                
-                                function_calls.append({
-                                    "type": "response",
-                                    "result": result_text or str(fr.response)
-                                })
-                                logger.info(f"Function response: {result_text or str(fr.response)}")
+                function_calls = _extract_function_calls(
+                    response.automatic_function_calling_history
+                )
             
-            # Update conversation history
-            self.conversations[session_id].append({
-                "role": "user",
-                "content": message
-            })
-            self.conversations[session_id].append({
-                "role": "assistant",
-                "content": response_text,
-                "function_calls": function_calls
-            })
+            self._finish_turn(session, cache_key, message, response_text, function_calls)
             
             return {
                 "response": response_text,
@@ -131,26 +197,131 @@ class GeminiMCPService:
                 "session_id": session_id
             }
     
-    def _convert_history_to_gemini_format(self, history: List[Dict[str, Any]]) -> List:
-        """Convert history to Gemini format"""
-        gemini_history = []
-        for msg in history:
-            if msg["role"] in ["user", "assistant"]:
-                gemini_history.append({
-                    "role": "user" if msg["role"] == "user" else "model",
-                    "parts": [{"text": msg["content"]}]
-                })
-        return gemini_history
+    async def send_message_stream(self, session_id: str, message: str) -> AsyncIterator[str]:
+        """
+        Send message to Gemini and yield the reply text as it is generated
+        
+        The turn is recorded once the stream completes.
+        """
+        session = self._get_or_create_session(session_id)
+        chat = session.chat
+        
+        cache_key = (session.prefix_digest, message)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            result = await self.send_message(session_id, message)
+            yield result["response"]
+            return
+        
+        text_parts = []
+        function_calls = []
+        try:
+            async with self.mcp_pool.get_connection() as mcp_session:
+                config = genai.types.GenerateContentConfig(
+                    temperature=0,
+                    tools=[mcp_session],
+                )
+                
+                async for chunk in await chat.send_message_stream(message, config=config):
+                    if chunk.automatic_function_calling_history:
+                        function_calls = _extract_function_calls(chunk.automatic_function_calling_history)
+                    if chunk.text:
+                        text_parts.append(chunk.text)
+                        yield chunk.text
+        except RuntimeError as e:
+            if "MCP connection not initialized" in str(e):
+                logger.error("MCP connection not initialized. Ensure app startup completed.")
+                raise ValueError("Service not ready. Please try again in a moment.")
+            raise
+        
+        self._finish_turn(session, cache_key, message, "".join(text_parts), function_calls)
+    
+    def _finish_turn(self, session: _ChatSession, cache_key: tuple, message: str, response_text: str, function_calls: List[Dict[str, Any]]) -> None:
+        """Cache a read-only turn (or invalidate after a write) and record it"""
+        called = {call["name"] for call in function_calls if call["type"] == "call"}
+        if called <= READ_ONLY_TOOLS:
+            self.response_cache.set(cache_key, (response_text, function_calls))
+        else:
+            # Data changed, so earlier answers may be stale
+            self.response_cache.clear()
+        
+        self._record_turn(session, message, response_text, function_calls)
+    
+    def _record_turn(self, session: _ChatSession, message: str, response_text: str, function_calls: List[Dict[str, Any]]) -> None:
+        """Append a completed turn to the session transcript"""
+        # Validated once here so history reads can hand the models straight out
+        session.history.append(ChatMessage(
+            role="user",
+            content=message
+        ))
+        session.history.append(ChatMessage(
+            role="assistant",
+            content=response_text,
+            function_calls=function_calls
+        ))
+        session.prefix_digest = hashlib.blake2b(
+            session.prefix_digest + message.encode() + b"\0" + response_text.encode(),
+            digest_size=16
+        ).digest()
+        session.turns += 1
+        if session.turns > MAX_TURNS:
+            self._trim_chat(session)
+    
+    def _get_or_create_session(self, session_id: str) -> _ChatSession:
+        """Look up a session, creating it and evicting the oldest if needed"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = _ChatSession(self.client.aio.chats.create(model=self.model))
+            self.sessions[session_id] = session
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+        return session
+    
+    def _trim_chat(self, session: _ChatSession) -> None:
+        """Restart the chat from the most recent half of its turns"""
+        history = session.chat.get_history()
+        
+        # A turn starts at a user text message (tool responses are also
+        # sent as role "user" but carry no text)
+        turn_starts = [
+            i for i, content in enumerate(history)
+            if content.role == "user" and any(part.text for part in content.parts or [])
+        ]
+        keep = MAX_TURNS // 2
+        if len(turn_starts) <= keep:
+            return
+        
+        session.chat = self.client.aio.chats.create(
+            model=self.model,
+            history=history[turn_starts[-keep]:]
+        )
+        session.turns = keep
+    
+    def evict_idle_sessions(self, max_idle: float = SESSION_IDLE_TTL) -> int:
+        """Drop sessions not used within max_idle seconds"""
+        cutoff = time.monotonic() - max_idle
+        evicted = 0
+        # Oldest sessions sit at the front, so stop at the first recent one
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_access >= cutoff:
+                break
+            del self.sessions[session_id]
+            evicted += 1
+        return evicted
     
-    async def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
+    async def get_session_history(self, session_id: str) -> List[ChatMessage]:
         """Get conversation history"""
-        return self.conversations.get(session_id, [])
+        session = self.sessions.get(session_id)
+        return list(session.history) if session else []
     
     async def close_session(self, session_id: str) -> None:
         """Close a session"""
-        if session_id in self.conversations:
-            del self.conversations[session_id]
+        self.sessions.pop(session_id, None)
     
     async def close_all_sessions(self) -> None:
         """Close all sessions"""
-        self.conversations.clear()
\ No newline at end of file
+        self.sessions.clear()
\ No newline at end of file
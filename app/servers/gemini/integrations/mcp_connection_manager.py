@@ -4,13 +4,82 @@ Handles persistent MCP connections to avoid task context issues
 """
 import asyncio
 import logging
-from typing import Optional, Dict, Any
-from contextlib import asynccontextmanager
+import anyio
+from typing import Optional, List
+from contextlib import asynccontextmanager, AsyncExitStack
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_client_server_memory_streams
+from app.shared.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Wait before replacing a pooled connection that died, so a server that
+# keeps failing isn't restarted in a tight loop
+RECONNECT_DELAY = 1.0  # seconds
+
+
+async def _open_transport(stack: AsyncExitStack):
+    """
+    Open the client read/write streams for one MCP connection on the stack
+    
+    With MCP_TRANSPORT=memory (the default) the expense-tracker server runs in
+    this process and tool calls are passed over in-memory streams, skipping
+    the subprocess and the JSON round trip over stdio. MCP_TRANSPORT=stdio
+    spawns run_mcp.py as before, for when the server needs isolation.
+    """
+    if get_settings().mcp_transport == "stdio":
+        server_params = StdioServerParameters(
+            command="python",
+            args=["run_mcp.py"],
+        )
+        return await stack.enter_async_context(stdio_client(server_params))
+    
+    # Imported lazily so the stdio path doesn't load the tools and their
+    # database/embedding dependencies into this process
+    from app.servers.mcp.server import mcp as mcp_server
+    server = mcp_server._mcp_server
+    
+    client_streams, server_streams = await stack.enter_async_context(
+        create_client_server_memory_streams()
+    )
+    task_group = await stack.enter_async_context(anyio.create_task_group())
+    task_group.start_soon(
+        server.run,
+        server_streams[0],
+        server_streams[1],
+        server.create_initialization_options()
+    )
+    # Stop the server loop before the task group waits on it at exit
+    stack.callback(task_group.cancel_scope.cancel)
+    return client_streams
+
+
+class CachedToolsClientSession(ClientSession):
+    """
+    ClientSession that remembers the server's tool list
+    
+    The Gemini SDK calls list_tools() on every generate call when given an
+    MCP session. Our server's tools are fixed for the life of the process,
+    so the first listing is reused instead of round-tripping each turn.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tools_result = None
+    
+    async def list_tools(self, *args, **kwargs):
+        if args or kwargs:
+            # Paginated requests go straight to the server
+            return await super().list_tools(*args, **kwargs)
+        if self._tools_result is None:
+            self._tools_result = await super().list_tools()
+        return self._tools_result
+    
+    def invalidate_tools(self) -> None:
+        """Forget the cached tool list"""
+        self._tools_result = None
+
 
 class MCPConnectionManager:
     """Manages persistent MCP connections at application level"""
@@ -19,7 +88,6 @@ class MCPConnectionManager:
         self.session: Optional[ClientSession] = None
         self.read_stream = None
         self.write_stream = None
-        self._lock = asyncio.Lock()
         self._initialized = False
         self._stdio_context = None
         self._session_context = None
@@ -45,11 +113,12 @@ class MCPConnectionManager:
             self.read_stream, self.write_stream = await self._stdio_context.__aenter__()
             
             # Create the client session
-            self._session_context = ClientSession(self.read_stream, self.write_stream)
+            self._session_context = CachedToolsClientSession(self.read_stream, self.write_stream)
             self.session = await self._session_context.__aenter__()
             
-            # Initialize the session
+            # Initialize the session and fetch the tool list once
             await self.session.initialize()
+            await self.session.list_tools()
             
             self._initialized = True
             logger.info("MCP connection initialized successfully")
@@ -86,12 +155,13 @@ class MCPConnectionManager:
     
     @asynccontextmanager
     async def get_session(self):
-        """Get the MCP session with thread-safe access"""
+        """Get the MCP session"""
         if not self._initialized:
             raise RuntimeError("MCP connection not initialized. Call initialize() first.")
             
-        async with self._lock:
-            yield self.session
+        # ClientSession multiplexes requests by id, so concurrent callers can
+        # share it without serializing on a lock
+        yield self.session
     
     def is_initialized(self) -> bool:
         """Check if MCP connection is initialized"""
@@ -101,14 +171,24 @@ class MCPConnectionManager:
 class MCPConnectionPool:
     """
     Manages a pool of MCP connections for handling concurrent requests
-    This is an alternative approach if single connection becomes a bottleneck
+    
+    With the default memory transport every connection talks to the same
+    in-process FastMCP server, so they share its tools, singletons and
+    caches; pooling only keeps concurrent chats from queueing on one
+    session. With MCP_TRANSPORT=stdio each connection is its own server
+    process, isolated from the others.
     """
     
     def __init__(self, pool_size: int = 3):
         self.pool_size = pool_size
-        self.connections = asyncio.Queue(maxsize=pool_size)
+        # Unbounded: a dead session can still sit here until a borrower
+        # drops it, alongside its replacement
+        self.connections = asyncio.Queue()
         self._initialized = False
-        self._connections_data = []
+        self._tasks: List[asyncio.Task] = []
+        self._shutdown_event: Optional[asyncio.Event] = None
+        # Sessions whose connection is still open
+        self._live: set = set()
         
     async def initialize(self) -> None:
         """Initialize the connection pool"""
@@ -117,77 +197,119 @@ class MCPConnectionPool:
             
         logger.info(f"Initializing MCP connection pool with {self.pool_size} connections...")
         
-        for i in range(self.pool_size):
-            try:
-                conn_data = await self._create_connection(i)
-                self._connections_data.append(conn_data)
-                await self.connections.put(conn_data['session'])
-            except Exception as e:
-                logger.error(f"Failed to create connection {i}: {str(e)}")
-                # Clean up any created connections
-                await self.shutdown()
-                raise
+        # Open every connection at once so warmup costs one startup, not pool_size
+        loop = asyncio.get_running_loop()
+        self._shutdown_event = asyncio.Event()
+        ready = [loop.create_future() for _ in range(self.pool_size)]
+        self._tasks = [
+            asyncio.create_task(self._run_connection(i, future))
+            for i, future in enumerate(ready)
+        ]
+        
+        results = await asyncio.gather(*ready, return_exceptions=True)
+        failures = [r for r in results if isinstance(r, BaseException)]
+        if failures:
+            logger.error(f"Failed to create {len(failures)} of {self.pool_size} connections: {str(failures[0])}")
+            # Clean up any created connections
+            await self.shutdown()
+            raise failures[0]
+        
+        for session in results:
+            self.connections.put_nowait(session)
                 
         self._initialized = True
         logger.info("MCP connection pool initialized successfully")
         
-    async def _create_connection(self, index: int) -> Dict[str, Any]:
-        """Create a single MCP connection"""
-        server_params = StdioServerParameters(
-            command="python",
-            args=["run_mcp.py"],
-        )
-        
-        # Create the connection with proper context management
-        stdio_ctx = stdio_client(server_params)
-        read, write = await stdio_ctx.__aenter__()
+    async def _run_connection(self, index: int, ready: asyncio.Future) -> None:
+        """
+        Own a single MCP connection for the lifetime of the pool
         
-        session_ctx = ClientSession(read, write)
-        session = await session_ctx.__aenter__()
-        await session.initialize()
+        Both transports open anyio cancel scopes, which must be exited
+        by the task that entered them, so each connection lives in its own
+        task and its exit stack unwinds there when the pool shuts down.
+        """
+        shutdown_event = self._shutdown_event
+        session = None
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await _open_transport(stack)
+                session = await stack.enter_async_context(CachedToolsClientSession(read, write))
+                await session.initialize()
+                await session.list_tools()
+                
+                self._live.add(session)
+                ready.set_result(session)
+                await shutdown_event.wait()
+        except BaseException as e:
+            # Cancellation and anyio's BaseExceptionGroup land here too; the
+            # waiter must always hear back or initialize() hangs
+            if not ready.done():
+                error = e
+                if isinstance(e, asyncio.CancelledError):
+                    # Don't hand the waiter a CancelledError it didn't cause
+                    error = RuntimeError(f"MCP connection {index} was cancelled during startup")
+                ready.set_exception(error)
+            else:
+                logger.error(f"Error in MCP connection {index}: {e!r}")
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self._live.discard(session)
+            if not shutdown_event.is_set():
+                # Held in the task list so shutdown() waits for it
+                self._tasks[index] = asyncio.create_task(self._replace_connection(index, shutdown_event))
+    
+    async def _replace_connection(self, index: int, shutdown_event: asyncio.Event) -> None:
+        """Start a new connection in place of one that died and add it to the pool"""
+        await asyncio.sleep(RECONNECT_DELAY)
+        if shutdown_event.is_set():
+            return
         
-        return {
-            'index': index,
-            'session': session,
-            'stdio_ctx': stdio_ctx,
-            'session_ctx': session_ctx,
-            'read': read,
-            'write': write
-        }
+        logger.info(f"Replacing MCP connection {index}...")
+        ready = asyncio.get_running_loop().create_future()
+        self._tasks[index] = asyncio.create_task(self._run_connection(index, ready))
+        try:
+            session = await ready
+        except BaseException as e:
+            # _run_connection has already scheduled another attempt
+            logger.error(f"Failed to replace MCP connection {index}: {str(e)}")
+            return
+        self.connections.put_nowait(session)
     
     async def shutdown(self) -> None:
         """Shutdown all connections in the pool"""
         logger.info("Shutting down MCP connection pool...")
         
-        for conn_data in self._connections_data:
-            try:
-                # Clean up session
-                if 'session_ctx' in conn_data:
-                    await conn_data['session_ctx'].__aexit__(None, None, None)
-                    
-                # Clean up stdio
-                if 'stdio_ctx' in conn_data:
-                    await conn_data['stdio_ctx'].__aexit__(None, None, None)
-                    
-            except Exception as e:
-                logger.error(f"Error shutting down connection {conn_data.get('index', '?')}: {str(e)}")
+        if self._shutdown_event:
+            self._shutdown_event.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
                 
-        self._connections_data.clear()
+        self._tasks.clear()
+        self._live.clear()
+        self.connections = asyncio.Queue()
         self._initialized = False
         
     @asynccontextmanager
     async def get_connection(self):
         """Get a connection from the pool"""
         if not self._initialized:
-            raise RuntimeError("MCP connection pool not initialized")
+            raise RuntimeError("MCP connection not initialized. Call initialize() first.")
             
-        # Get connection from pool (blocks if none available)
+        # Get connection from pool (blocks if none available), dropping any
+        # whose connection has died; replacements join the queue on their own
         session = await self.connections.get()
+        while session not in self._live:
+            session = await self.connections.get()
         try:
             yield session
         finally:
-            # Return connection to pool
-            await self.connections.put(session)
+            # Return connection to pool unless it died while borrowed
+            if session in self._live:
+                self.connections.put_nowait(session)
+    
+    def is_initialized(self) -> bool:
+        """Check if the connection pool is initialized"""
+        return self._initialized
 
 
 # Global singleton instance
@@ -199,4 +321,16 @@ def get_mcp_manager() -> MCPConnectionManager:
     global _mcp_manager
     if _mcp_manager is None:
         _mcp_manager = MCPConnectionManager()
-    return _mcp_manager
\ No newline at end of file
+    return _mcp_manager
+
+
+# Global pool instance
+_mcp_pool: Optional[MCPConnectionPool] = None
+
+
+def get_mcp_pool() -> MCPConnectionPool:
+    """Get the global MCP connection pool"""
+    global _mcp_pool
+    if _mcp_pool is None:
+        _mcp_pool = MCPConnectionPool()
+    return _mcp_pool
\ No newline at end of file
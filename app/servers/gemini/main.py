@@ -1,42 +1,73 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 from app.servers.gemini.routes import chat, auth
-from app.servers.gemini.integrations.mcp_connection_manager import get_mcp_manager
+from app.servers.gemini.integrations.mcp_connection_manager import get_mcp_pool
+from app.servers.gemini.integrations.gemini_mcp_service import GeminiMCPService
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How often idle chat sessions are swept, in seconds
+SESSION_SWEEP_INTERVAL = 60
+
+
+async def sweep_idle_sessions(gemini_service: GeminiMCPService):
+    """Periodically drop chat sessions that have gone idle"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        evicted = gemini_service.evict_idle_sessions()
+        if evicted:
+            logger.info(f"Evicted {evicted} idle chat sessions")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize MCP connection
+    # Startup: Initialize MCP connection pool
     logger.info("Starting up Gemini server...")
-    mcp_manager = get_mcp_manager()
+    # uvicorn's default loop="auto" picks uvloop when it is installed
+    logger.info(f"Event loop: {type(asyncio.get_running_loop()).__module__}")
+    mcp_pool = get_mcp_pool()
     
     try:
-        await mcp_manager.initialize()
-        logger.info("MCP connection initialized successfully")
+        await mcp_pool.initialize()
+        logger.info("MCP connection pool initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize MCP connection: {str(e)}")
         # Continue without MCP if initialization fails
         # The service will handle this gracefully
     
+    # Create the chat service once; routes read it from app.state
+    gemini_service = None
+    sweeper = None
+    try:
+        gemini_service = GeminiMCPService()
+        sweeper = asyncio.create_task(sweep_idle_sessions(gemini_service))
+    except ValueError as e:
+        logger.error(f"Failed to create Gemini service: {str(e)}")
+    app.state.gemini_service = gemini_service
+    
     yield
     
-    # Shutdown: Clean up MCP connection
+    # Shutdown: Clean up MCP connections
     logger.info("Shutting down Gemini server...")
-    await mcp_manager.shutdown()
-    await chat.cleanup_sessions()
+    if sweeper:
+        sweeper.cancel()
+    await mcp_pool.shutdown()
+    if gemini_service:
+        await gemini_service.close_all_sessions()
 
 
 app = FastAPI(
     title="Expense Tracker Gemini AI Chat",
     description="Gemini AI chat interface for expense tracking with MCP tools integration and JWT authentication",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware for frontend integration
@@ -66,6 +97,7 @@ async def root():
         },
         "endpoints": {
             "chat": "POST /api/v1/chat",
+            "chat_stream": "POST /api/v1/chat/stream",
             "history": "GET /api/v1/chat/history/{session_id}",
             "health": "GET /health",
             "docs": "GET /docs"
@@ -2,8 +2,9 @@
 Authentication routes for Gemini server
 """
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from app.core.models.auth_models import LoginRequest, RefreshTokenRequest, TokenResponse
-from app.servers.gemini.auth.jwt_auth import get_auth_service, SupabaseAuthService, get_current_user
+from app.servers.gemini.auth.jwt_auth import get_auth_service, SupabaseAuthService, get_current_user, security
 
 router = APIRouter()
 
@@ -50,15 +51,16 @@ async def refresh_token(
 @router.post("/auth/logout")
 async def logout(
     auth_service: SupabaseAuthService = Depends(get_auth_service),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
     """
     Sign out current user.
     
     Requires authentication.
     """
-    # Note: This would require the access token to be passed
-    # For now, we'll just return success
+    # Drop the cached verification so the token is checked again on next use
+    auth_service.invalidate_token(credentials.credentials)
     return {"message": "Logged out successfully"}
 
 
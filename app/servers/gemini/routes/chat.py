@@ -1,26 +1,24 @@
 """
 Chat endpoint for Gemini AI integration with JWT authentication
 """
+import json
 import uuid
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends
-from app.core.models.chat_models import ChatRequest, ChatResponse, ChatHistoryResponse, ChatMessage
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from app.core.models.chat_models import ChatRequest, ChatResponse, ChatHistoryResponse
 from app.core.models.auth_models import UserInfo
 from app.servers.gemini.integrations.gemini_mcp_service import GeminiMCPService as GeminiChatService
 from app.servers.gemini.auth.jwt_auth import get_current_user, get_optional_user
 
 router = APIRouter()
 
-# Singleton Gemini service
-_gemini_service: Optional[GeminiChatService] = None
 
-
-async def get_gemini_service() -> GeminiChatService:
-    """Get or create Gemini service instance"""
-    global _gemini_service
-    if _gemini_service is None:
-        _gemini_service = GeminiChatService()
-    return _gemini_service
+def get_gemini_service(request: Request) -> GeminiChatService:
+    """Get the Gemini service created at application startup"""
+    service = getattr(request.app.state, "gemini_service", None)
+    if service is None:
+        raise HTTPException(status_code=503, detail="Chat service is not available")
+    return service
 
 
 @router.post("/chat", response_model=ChatResponse)
@@ -63,6 +61,36 @@ async def chat_with_gemini(
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def stream_chat_with_gemini(
+    request: ChatRequest,
+    current_user: UserInfo = Depends(get_current_user),
+    gemini_service: GeminiChatService = Depends(get_gemini_service)
+):
+    """
+    Send a message to Gemini AI and stream the reply as Server-Sent Events.
+    
+    Each `message` event carries a JSON object with a `text` delta. A final
+    `done` event carries the `session_id`; an `error` event is sent instead
+    if generation fails part way.
+    
+    Requires authentication.
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    user_message = f"[User: {current_user.email}] {request.message}"
+    
+    async def event_stream():
+        try:
+            async for text in gemini_service.send_message_stream(session_id, user_message):
+                yield f"event: message\ndata: {json.dumps({'text': text})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'session_id': session_id})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/chat/history/{session_id}", response_model=ChatHistoryResponse)
 async def get_chat_history(
     session_id: str,
@@ -74,15 +102,13 @@ async def get_chat_history(
     
     Requires authentication.
     """
-    raw_history = await gemini_service.get_session_history(session_id)
-
-    # Convert raw dicts to ChatMessage objects for type safety
-    parsed_history = [ChatMessage(**msg) for msg in raw_history]
+    # Messages are validated when the turn is stored, so they pass through as-is
+    history = await gemini_service.get_session_history(session_id)
 
     return ChatHistoryResponse(
         session_id=session_id,
-        history=parsed_history,
-        message_count=len(parsed_history)
+        history=history,
+        message_count=len(history)
     )
 
 
@@ -99,9 +125,3 @@ async def close_chat_session(
     """
     await gemini_service.close_session(session_id)
     return {"message": f"Session {session_id} closed successfully"}
-
-
-async def cleanup_sessions():
-    """Cleanup all sessions on shutdown"""
-    if _gemini_service:
-        await _gemini_service.close_all_sessions()
\ No newline at end of file
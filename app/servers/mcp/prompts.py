@@ -4,13 +4,7 @@ MCP Prompts for Expense Tracker - System prompts and instructions
 from mcp.server.fastmcp import FastMCP
 
 
-def register_prompts(mcp: FastMCP):
-    """Register all MCP prompts with the server"""
-    
-    @mcp.prompt(name="add_transaction", description="Instructions for parsing natural language transaction descriptions")
-    def add_transaction_prompt() -> str:
-        """Instructions for adding a new transaction"""
-        return """Transaction Entry Instructions:
+ADD_TRANSACTION_PROMPT = """Transaction Entry Instructions:
 
 Parse natural language transaction descriptions and extract:
 
@@ -71,4 +65,13 @@ CRITICAL: When using the create_expense tool, always pass:
 - POSITIVE amounts for income/credits
 
 Always extract as much information as possible from the natural language description.
-"""
\ No newline at end of file
+"""
+
+
+def register_prompts(mcp: FastMCP):
+    """Register all MCP prompts with the server"""
+    
+    @mcp.prompt(name="add_transaction", description="Instructions for parsing natural language transaction descriptions")
+    def add_transaction_prompt() -> str:
+        """Instructions for adding a new transaction"""
+        return ADD_TRANSACTION_PROMPT
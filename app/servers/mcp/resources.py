@@ -5,6 +5,65 @@ from mcp.server.fastmcp import FastMCP
 from app.servers.mcp.tags_config import PREDEFINED_TAGS
 
 
+# Tags organized by category for the available-tags resource
+_TAG_GROUPS = {
+    "Subscription Frequency": {
+        "annual-subscription": "Yearly subscription payment",
+        "monthly-subscription": "Monthly subscription payment",
+        "quarterly-subscription": "Quarterly subscription payment"
+    },
+    "Expense Type": {
+        "recurring": "Regular recurring expense",
+        "one-time": "One-time purchase",
+        "subscription": "General subscription service"
+    },
+    "Category": {
+        "business": "Business related expense",
+        "personal": "Personal expense",
+        "travel": "Travel related expense",
+        "online": "Online purchase"
+    },
+    "Special": {
+        "tax-deductible": "Tax deductible expense",
+        "reimbursable": "Expense eligible for reimbursement",
+        "shared": "Shared expense with others"
+    },
+    "Payment Method": {
+        "cash": "Cash payment",
+        "credit-card": "Credit card payment",
+        "debit-card": "Debit card payment",
+        "bank-transfer": "Bank transfer payment"
+    }
+}
+
+
+def _format_available_tags() -> str:
+    """Render the available-tags resource text"""
+    parts = [
+        "Available Tags for Expense Tracking:\n\n",
+        "IMPORTANT: Only use these predefined tags when creating or updating transactions.\n\n",
+    ]
+    for category, tags in _TAG_GROUPS.items():
+        parts.append(f"📌 {category}:\n")
+        for tag, description in tags.items():
+            parts.append(f"   • {tag} - {description}\n")
+        parts.append("\n")
+    
+    parts.append("💡 Tips:\n")
+    parts.append("   - Multiple tags can be applied to a single transaction\n")
+    parts.append("   - Use subscription frequency tags for recurring payments\n")
+    parts.append("   - Add payment method tags for better tracking\n")
+    parts.append("   - Apply special tags for tax or reimbursement purposes")
+    return "".join(parts)
+
+
+# Display format for transaction dates in resources
+_DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# The tag list is static, so the resource text is built once at import
+AVAILABLE_TAGS_TEXT = _format_available_tags()
+
+
 def register_resources(mcp: FastMCP):
     """Register all MCP resources with the server"""
     
@@ -22,21 +81,23 @@ def register_resources(mcp: FastMCP):
             
             recent_transactions = await transaction_repo.get_transactions(0, 20)
             
-            output = "Recent Transactions:\n\n"
+            # Look up every referenced category in one query
+            categories = await category_repo.get_categories_by_ids(
+                t.category_id for t in recent_transactions if t.category_id
+            )
+            
+            parts = ["Recent Transactions:\n\n"]
             for t in recent_transactions:
                 # Get category name if available
-                category_name = "Uncategorized"
-                if t.category_id:
-                    category = await category_repo.get_category(str(t.category_id))
-                    if category:
-                        category_name = category.name
+                category = categories.get(str(t.category_id)) if t.category_id else None
+                category_name = category.name if category else "Uncategorized"
                 
                 # Format date for better readability
-                date_str = t.date.strftime("%Y-%m-%d %H:%M") if hasattr(t.date, 'strftime') else str(t.date)
+                date_str = t.date.strftime(_DATE_FORMAT) if hasattr(t.date, 'strftime') else str(t.date)
                 
-                output += f"• {date_str} - ₹{float(t.amount):.2f} at {t.merchant} ({category_name})\n"
+                parts.append(f"• {date_str} - ₹{float(t.amount):.2f} at {t.merchant} ({category_name})\n")
             
-            return output
+            return "".join(parts)
         except Exception as e:
             return f"Error loading transactions: {str(e)}"
     
@@ -44,53 +105,4 @@ def register_resources(mcp: FastMCP):
     @mcp.resource("expense-tracker://available-tags")
     async def available_tags_resource() -> str:
         """Resource providing all available predefined tags for expense categorization"""
-        try:
-            # Organize tags by category
-            tag_categories = {
-                "Subscription Frequency": {
-                    "annual-subscription": "Yearly subscription payment",
-                    "monthly-subscription": "Monthly subscription payment",
-                    "quarterly-subscription": "Quarterly subscription payment"
-                },
-                "Expense Type": {
-                    "recurring": "Regular recurring expense",
-                    "one-time": "One-time purchase",
-                    "subscription": "General subscription service"
-                },
-                "Category": {
-                    "business": "Business related expense",
-                    "personal": "Personal expense",
-                    "travel": "Travel related expense",
-                    "online": "Online purchase"
-                },
-                "Special": {
-                    "tax-deductible": "Tax deductible expense",
-                    "reimbursable": "Expense eligible for reimbursement",
-                    "shared": "Shared expense with others"
-                },
-                "Payment Method": {
-                    "cash": "Cash payment",
-                    "credit-card": "Credit card payment",
-                    "debit-card": "Debit card payment",
-                    "bank-transfer": "Bank transfer payment"
-                }
-            }
-            
-            output = "Available Tags for Expense Tracking:\n\n"
-            output += "IMPORTANT: Only use these predefined tags when creating or updating transactions.\n\n"
-            
-            for category, tags in tag_categories.items():
-                output += f"📌 {category}:\n"
-                for tag, description in tags.items():
-                    output += f"   • {tag} - {description}\n"
-                output += "\n"
-            
-            output += "💡 Tips:\n"
-            output += "   - Multiple tags can be applied to a single transaction\n"
-            output += "   - Use subscription frequency tags for recurring payments\n"
-            output += "   - Add payment method tags for better tracking\n"
-            output += "   - Apply special tags for tax or reimbursement purposes"
-            
-            return output
-        except Exception as e:
-            return f"Error loading available tags: {str(e)}"
\ No newline at end of file
+        return AVAILABLE_TAGS_TEXT
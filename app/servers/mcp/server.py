@@ -1,6 +1,7 @@
 """
 MCP Server for Expense Tracker - Main entry point
 """
+import logging
 import sys
 from pathlib import Path
 
@@ -10,6 +11,12 @@ sys.path.insert(0, str(project_root))
 
 from mcp.server.fastmcp import FastMCP
 
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 # Import registration functions
 from app.servers.mcp.tools import register_tools
 from app.servers.mcp.resources import register_resources
@@ -26,6 +33,11 @@ register_prompts(mcp)
 # Entry point for the MCP server
 def main():
     """Main entry point for the MCP server"""
+    logging.basicConfig(level=logging.INFO)
+    # Installed here rather than at import so the in-process transport used
+    # by the Gemini server doesn't touch its event loop policy
+    if UVLOOP_AVAILABLE:
+        uvloop.install()
     mcp.run()
 
 # Run the MCP server
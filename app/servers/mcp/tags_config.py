@@ -32,8 +32,9 @@ PREDEFINED_TAGS = {
     "bank-transfer": "Bank transfer payment"
 }
 
-# Get list of valid tag values
+# Get list of valid tag values (ordered, for messages) and a set for lookups
 VALID_TAGS = list(PREDEFINED_TAGS.keys())
+VALID_TAG_SET = frozenset(VALID_TAGS)
 
 def validate_tags(tags: list) -> tuple[bool, list]:
     """
@@ -43,8 +44,8 @@ def validate_tags(tags: list) -> tuple[bool, list]:
     if not tags:
         return True, []
     
-    invalid_tags = [tag for tag in tags if tag not in VALID_TAGS]
-    return len(invalid_tags) == 0, invalid_tags
+    invalid_tags = [tag for tag in tags if tag not in VALID_TAG_SET]
+    return not invalid_tags, invalid_tags
 
 def get_tag_description(tag: str) -> str:
     """Get description for a specific tag"""
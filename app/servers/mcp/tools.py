@@ -1,9 +1,13 @@
 """
 MCP Tools for Expense Tracker
 """
+import asyncio
+import functools
 import logging
-from typing import List, Optional
-from datetime import datetime, timezone
+import sys
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from datetime import date as date_type, datetime, time, timezone
 from decimal import Decimal
 import uuid
 
@@ -21,11 +25,35 @@ from app.servers.mcp.tags_config import validate_tags, VALID_TAGS
 
 # Set up logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+
+
+# Category names resolved during the current tool call, keyed by category_id.
+# Each MCP request runs in its own task, so this never leaks between calls.
+_category_names: ContextVar[Optional[Dict[str, str]]] = ContextVar("category_names", default=None)
+
+
+def _with_category_cache(func):
+    """Give a tool call its own category name cache"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _category_names.set({})
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _category_names.reset(token)
+    return wrapper
+
+
+# Built on first use and shared by every tool call
+_services: Optional[dict] = None
 
 
 def get_services():
-    """Get service instances"""
+    """Get the shared service instances, creating them on first use"""
+    global _services
+    if _services is not None:
+        return _services
+    
     # Initialize repositories
     category_repo = CategoryRepository(supabase)
     transaction_repo = TransactionRepository(supabase)
@@ -37,18 +65,20 @@ def get_services():
     tag_service = TagService(tag_repo)
     categorization_service = CategorizationService(supabase, category_repo)
     
-    return {
+    _services = {
         "category": category_service,
         "transaction": transaction_service,
         "tag": tag_service,
         "categorization": categorization_service
     }
+    return _services
 
 
 def register_tools(mcp: FastMCP):
     """Register all MCP tools"""
     
     @mcp.tool()
+    @_with_category_cache
     async def create_expense(
         amount: float,
         merchant: str,
@@ -86,11 +116,11 @@ def register_tools(mcp: FastMCP):
             # Parse and validate date
             try:
                 if date:
-                    transaction_date = datetime.fromisoformat(date.replace('Z', '+00:00'))
+                    transaction_date = _parse_iso_datetime(date)
                 else:
                     transaction_date = datetime.now(timezone.utc)
             except ValueError as e:
-                return {"error": f"Invalid date format: {date}. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)"}
+                return {"error": _invalid_date_error(date)}
             
             # Validate tags if provided
             if tags:
@@ -110,14 +140,11 @@ def register_tools(mcp: FastMCP):
                     return {"error": "Category name cannot be empty"}
                 
                 try:
-                    # Use a more efficient category lookup
-                    categories = await services["category"].get_categories(0, 1000)
-                    for cat in categories:
-                        if cat.name.lower() == category_name.lower():
-                            category_id = cat.category_id
-                            break
-                    if not category_id:
+                    category = await services["category"].find_category_by_name(category_name)
+                    if not category:
                         return {"error": f"Category '{category_name}' not found"}
+                    category_id = category.category_id
+                    _remember_category_name(category_id, category.name)
                 except Exception as e:
                     logger.error(f"Error looking up category: {str(e)}")
                     return {"error": f"Failed to look up category: {str(e)}"}
@@ -133,89 +160,72 @@ def register_tools(mcp: FastMCP):
                 notes=description.strip() if description else None
             )
             
-            # Create the transaction
-            try:
-                transaction = await services["transaction"].create_expense(transaction_data)
-            except Exception as e:
-                logger.error(f"Error creating transaction: {str(e)}")
-                return {"error": f"Failed to create transaction: {str(e)}"}
-            
-            # Auto-categorize if no category provided
+            # Auto-categorize before inserting, so the row is written once
+            # with its category instead of being inserted and then updated
+            auto_category = None
             if not category_id:
                 try:
                     cat_id, cat_name, confidence = await services["categorization"].categorize_transaction(
-                        transaction, description
+                        transaction_data, description
                     )
                     if cat_id:
-                        # Update transaction with category
-                        update_data = TransactionUpdate(category_id=cat_id)
-                        try:
-                            transaction = await services["transaction"].update_transaction(
-                                str(transaction.transaction_id), update_data
-                            )
-                        except Exception as e:
-                            logger.error(f"Error updating transaction with auto-category: {str(e)}")
-                            # Continue without category rather than failing completely
-                        
-                        # Store embedding for learning (non-blocking)
-                        try:
-                            transaction_text = services["categorization"].embedding_service.format_transaction_text(
-                                date=transaction.date,
-                                amount=transaction.amount,
-                                merchant=transaction.merchant,
-                                description=description,
-                                category=cat_name
-                            )
-                            await services["categorization"].store_transaction_embedding(
-                                transaction_id=transaction.transaction_id,
-                                transaction_text=transaction_text,
-                                category_id=cat_id,
-                                category_name=cat_name,
-                                confidence_score=confidence
-                            )
-                        except Exception as e:
-                            logger.warning(f"Failed to store embedding for learning: {str(e)}")
-                            # Non-critical failure, continue
+                        auto_category = (cat_id, cat_name, confidence)
+                        _remember_category_name(cat_id, cat_name)
+                        transaction_data = transaction_data.model_copy(update={"category_id": cat_id})
                 except Exception as e:
                     logger.warning(f"Auto-categorization failed: {str(e)}")
                     # Continue without auto-categorization rather than failing completely
             
+            # Create the transaction
+            try:
+                try:
+                    transaction = await services["transaction"].create_expense(transaction_data)
+                except ValueError as e:
+                    if not auto_category:
+                        raise
+                    # The suggested category is gone; save without it rather than failing
+                    logger.warning(f"Auto-category rejected, saving uncategorized: {str(e)}")
+                    auto_category = None
+                    transaction_data = transaction_data.model_copy(update={"category_id": None})
+                    transaction = await services["transaction"].create_expense(transaction_data)
+            except Exception as e:
+                logger.error(f"Error creating transaction: {str(e)}")
+                return {"error": f"Failed to create transaction: {str(e)}"}
+            
+            # Store embedding for learning off the request path
+            if auto_category:
+                cat_id, cat_name, confidence = auto_category
+                _run_in_background(_store_embedding(
+                    services["categorization"], transaction, description, cat_id, cat_name, confidence
+                ))
+            
             # Add tags if provided
+            tag_values = []
             if tags:
                 try:
-                    for tag_value in tags:
-                        tag = await services["tag"].get_or_create_tag(tag_value)
-                        await services["tag"].add_tag_to_transaction(
-                            str(transaction.transaction_id), str(tag.tag_id)
-                        )
+                    tag_objects = await services["tag"].attach_tags(
+                        str(transaction.transaction_id), tags
+                    )
+                    tag_values = [tag.value for tag in tag_objects]
                 except Exception as e:
                     logger.error(f"Error adding tags: {str(e)}")
                     # Continue without tags rather than failing completely
             
-            # Get final transaction with tags
-            try:
-                final_transaction = await services["transaction"].get_transaction_with_tags(
-                    str(transaction.transaction_id)
-                )
-            except Exception as e:
-                logger.error(f"Error getting final transaction: {str(e)}")
-                # Fall back to basic transaction data
-                final_transaction = transaction
-            
-            # Prepare response with proper amount sign
-            response_amount = float(final_transaction.amount)
+            # Build the response from what was just written; the inserted row,
+            # its category name and its tags are all known at this point
+            response_amount = float(transaction.amount)
             if amount < 0:  # If original amount was negative (expense), make response negative
                 response_amount = -response_amount
             
             return {
-                "transaction_id": str(final_transaction.transaction_id),
-                "date": final_transaction.date.isoformat(),
+                "transaction_id": str(transaction.transaction_id),
+                "date": transaction.date.isoformat(),
                 "amount": response_amount,
-                "merchant": final_transaction.merchant,
-                "category": await _get_category_name(final_transaction.category_id, services["category"]),
-                "tags": [tag.value for tag in final_transaction.tags] if hasattr(final_transaction, 'tags') and final_transaction.tags else [],
-                "is_recurring": final_transaction.is_recurring,
-                "notes": final_transaction.notes
+                "merchant": transaction.merchant,
+                "category": await _get_category_name(transaction.category_id, services["category"]),
+                "tags": tag_values,
+                "is_recurring": transaction.is_recurring,
+                "notes": transaction.notes
             }
             
         except Exception as e:
@@ -224,6 +234,7 @@ def register_tools(mcp: FastMCP):
     
     
     @mcp.tool()
+    @_with_category_cache
     async def update_expense(
         transaction_id: str,
         amount: Optional[float] = None,
@@ -276,7 +287,10 @@ def register_tools(mcp: FastMCP):
                 update_data["merchant"] = merchant
                 
             if date is not None:
-                update_data["date"] = datetime.fromisoformat(date.replace('Z', '+00:00'))
+                try:
+                    update_data["date"] = _parse_iso_datetime(date)
+                except ValueError:
+                    return {"error": _invalid_date_error(date)}
                 
             if is_recurring is not None:
                 update_data["is_recurring"] = is_recurring
@@ -286,36 +300,24 @@ def register_tools(mcp: FastMCP):
             
             # Handle category update
             if category_name is not None:
-                categories = await services["category"].get_categories(0, 1000)
-                category_id = None
-                for cat in categories:
-                    if cat.name.lower() == category_name.lower():
-                        category_id = cat.category_id
-                        break
-                if not category_id:
+                category = await services["category"].find_category_by_name(category_name)
+                if not category:
                     return {"error": f"Category '{category_name}' not found"}
-                update_data["category_id"] = category_id
+                update_data["category_id"] = category.category_id
+                _remember_category_name(category.category_id, category.name)
             
-            # Update transaction if there are changes
+            # The row update and the tag links touch different tables, so
+            # apply them concurrently
+            writes = []
             if update_data:
                 transaction_update = TransactionUpdate(**update_data)
-                updated_transaction = await services["transaction"].update_transaction(
+                writes.append(services["transaction"].update_transaction(
                     transaction_id, transaction_update
-                )
-            else:
-                updated_transaction = existing_transaction
-            
-            # Handle tags update if provided
+                ))
             if tags is not None:
-                # Remove existing tags
-                existing_tags = await services["tag"].get_transaction_tags(transaction_id)
-                for tag in existing_tags:
-                    await services["tag"].remove_tag_from_transaction(transaction_id, str(tag.tag_id))
-                
-                # Add new tags
-                for tag_value in tags:
-                    tag = await services["tag"].get_or_create_tag(tag_value)
-                    await services["tag"].add_tag_to_transaction(transaction_id, str(tag.tag_id))
+                writes.append(services["tag"].set_transaction_tags(transaction_id, tags))
+            if writes:
+                await asyncio.gather(*writes)
             
             # Get final transaction with tags
             final_transaction = await services["transaction"].get_transaction_with_tags(transaction_id)
@@ -325,7 +327,7 @@ def register_tools(mcp: FastMCP):
                 "date": final_transaction.date.isoformat(),
                 "amount": float(final_transaction.amount) * (-1 if amount < 0 else 1) if amount is not None else float(final_transaction.amount) * -1,
                 "merchant": final_transaction.merchant,
-                "category": await _get_category_name(final_transaction.category_id, services["category"]),
+                "category": final_transaction.category_name,
                 "tags": [tag.value for tag in final_transaction.tags],
                 "is_recurring": final_transaction.is_recurring,
                 "notes": final_transaction.notes
@@ -354,11 +356,9 @@ def register_tools(mcp: FastMCP):
             # Find category if specified
             category_id = None
             if category_name:
-                categories = await services["category"].get_categories(0, 1000)
-                for cat in categories:
-                    if cat.name.lower() == category_name.lower():
-                        category_id = str(cat.category_id)
-                        break
+                category = await services["category"].find_category_by_name(category_name)
+                if category:
+                    category_id = str(category.category_id)
             
             summary = await services["transaction"].get_spending_summary(period, category_id)
             
@@ -368,9 +368,9 @@ def register_tools(mcp: FastMCP):
                 avg_transaction = summary["average_transaction"]
                 insights.append(f"Average transaction: ₹{avg_transaction:.2f}")
                 
-                if summary["category_breakdown"]:
-                    top_category = max(summary["category_breakdown"].items(), key=lambda x: x[1])
-                    insights.append(f"Top spending category: {top_category[0]} (₹{top_category[1]:.2f})")
+                top_category = summary["top_category"]
+                if top_category:
+                    insights.append(f"Top spending category: {top_category['name']} (₹{top_category['total']:.2f})")
             
             summary["insights"] = insights
             return summary
@@ -415,10 +415,21 @@ def register_tools(mcp: FastMCP):
             limit = min(limit, 100)
             transactions = await services["transaction"].get_transactions(0, limit)
             
+            # Resolve categories and tags for the whole page in two queries
+            categories, tags_by_transaction = await asyncio.gather(
+                services["category"].get_categories_by_ids(
+                    tx.category_id for tx in transactions if tx.category_id
+                ),
+                services["tag"].get_tags_for_transactions(
+                    tx.transaction_id for tx in transactions
+                )
+            )
+            
             result = []
             for tx in transactions:
-                category_name = await _get_category_name(tx.category_id, services["category"])
-                tags = await services["tag"].get_transaction_tags(str(tx.transaction_id))
+                category = categories.get(str(tx.category_id)) if tx.category_id else None
+                category_name = category.name if category else None
+                tags = tags_by_transaction.get(str(tx.transaction_id), [])
                 
                 result.append({
                     "transaction_id": str(tx.transaction_id),
@@ -436,11 +447,135 @@ def register_tools(mcp: FastMCP):
         except Exception as e:
             logger.error(f"Error getting recent transactions: {str(e)}")
             return {"error": str(e)}
+    
+    
+    @mcp.tool()
+    async def backfill_embeddings(limit: int = 100) -> dict:
+        """
+        Teach auto-categorization from existing categorized transactions.
+        
+        Args:
+            limit: Number of most recent transactions to learn from (max 500)
+            
+        Returns:
+            Number of transactions whose embeddings were stored
+        """
+        services = get_services()
+        
+        try:
+            limit = min(limit, 500)
+            transactions = [
+                tx for tx in await services["transaction"].get_transactions(0, limit)
+                if tx.category_id
+            ]
+            categories = await services["category"].get_categories_by_ids(
+                tx.category_id for tx in transactions
+            )
+            
+            embedding_service = services["categorization"].embedding_service
+            items = []
+            for tx in transactions:
+                category = categories.get(str(tx.category_id))
+                if not category:
+                    continue
+                items.append({
+                    "transaction_id": tx.transaction_id,
+                    "transaction_text": embedding_service.format_transaction_text(
+                        date=tx.date,
+                        amount=tx.amount,
+                        merchant=tx.merchant,
+                        description=tx.notes,
+                        category=category.name
+                    ),
+                    "category_id": category.category_id,
+                    "category_name": category.name
+                })
+            
+            stored = await services["categorization"].store_transaction_embeddings_batch(items)
+            return {"stored": stored}
+            
+        except Exception as e:
+            logger.error(f"Error backfilling embeddings: {str(e)}")
+            return {"error": str(e)}
+
+
+# Keep references to fire-and-forget tasks so they aren't garbage collected
+_background_tasks: set = set()
+
+
+def _run_in_background(coro) -> None:
+    """Schedule a coroutine without waiting for it"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _store_embedding(
+    categorization_service: CategorizationService,
+    transaction,
+    description: Optional[str],
+    category_id: uuid.UUID,
+    category_name: str,
+    confidence: float
+) -> None:
+    """Store a categorized transaction's embedding for future similarity matches"""
+    try:
+        transaction_text = categorization_service.embedding_service.format_transaction_text(
+            date=transaction.date,
+            amount=transaction.amount,
+            merchant=transaction.merchant,
+            description=description,
+            category=category_name
+        )
+        await categorization_service.store_transaction_embedding(
+            transaction_id=transaction.transaction_id,
+            transaction_text=transaction_text,
+            category_id=category_id,
+            category_name=category_name,
+            confidence_score=confidence
+        )
+    except Exception as e:
+        # Non-critical failure, the expense is already saved
+        logger.warning(f"Failed to store embedding for learning: {str(e)}")
 
 
 async def _get_category_name(category_id: Optional[uuid.UUID], category_service: CategoryService) -> Optional[str]:
     """Helper to get category name from ID"""
     if not category_id:
         return None
-    category = await category_service.get_category(str(category_id))
-    return category.name if category else None
\ No newline at end of file
+    
+    cache = _category_names.get()
+    key = str(category_id)
+    if cache is not None and key in cache:
+        return cache[key]
+    
+    category = await category_service.get_category(key)
+    name = category.name if category else None
+    if cache is not None and name:
+        cache[key] = name
+    return name
+
+
+def _remember_category_name(category_id, name: Optional[str]) -> None:
+    """Record a category name already known in this tool call"""
+    cache = _category_names.get()
+    if cache is not None and category_id and name:
+        cache[str(category_id)] = name
+
+
+# fromisoformat only accepts a trailing 'Z' from Python 3.11 on
+_DATEPARSE_NEEDS_Z_FIX = sys.version_info < (3, 11)
+
+
+def _parse_iso_datetime(value: str) -> datetime:
+    """Parse an ISO 8601 date or datetime, accepting a trailing 'Z' for UTC"""
+    # Plain YYYY-MM-DD is the common case from the LLM, midnight UTC
+    if len(value) == 10:
+        return datetime.combine(date_type.fromisoformat(value), time.min, tzinfo=timezone.utc)
+    if _DATEPARSE_NEEDS_Z_FIX and value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+def _invalid_date_error(value: str) -> str:
+    return f"Invalid date format: {value}. Use ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)"
\ No newline at end of file
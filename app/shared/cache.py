@@ -0,0 +1,93 @@
+"""
+Small in-process caches shared by the servers
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU cache whose entries also expire after a fixed number of seconds
+    
+    Not thread-safe; callers are expected to use it from a single event loop.
+    """
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable) -> None:
+        """Remove a key if present"""
+        self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """Remove every entry"""
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    """
+    Cache that keeps one-off keys from evicting the hot working set
+    
+    New entries land in a small transient tier. A key that is read again
+    while still there is promoted to the larger resident tier, so a burst
+    of unique lookups only churns the transient tier.
+    """
+    
+    def __init__(self, transient_size: int = 128, resident_size: int = 4096, ttl: float = 900.0):
+        self.transient = TTLCache(maxsize=transient_size, ttl=ttl)
+        self.resident = TTLCache(maxsize=resident_size, ttl=ttl)
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, promoting it on a repeat hit"""
+        value = self.resident.get(key)
+        if value is not None:
+            return value
+        
+        value = self.transient.get(key)
+        if value is not None:
+            self.transient.pop(key)
+            self.resident.set(key, value)
+        return value
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value in the transient tier"""
+        self.resident.pop(key)
+        self.transient.set(key, value)
+    
+    def pop(self, key: Hashable) -> None:
+        """Remove a key from both tiers"""
+        self.transient.pop(key)
+        self.resident.pop(key)
+    
+    def clear(self) -> None:
+        """Remove every entry from both tiers"""
+        self.transient.clear()
+        self.resident.clear()
@@ -1,4 +1,4 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 import os
 
@@ -6,13 +6,23 @@ import os
 class Settings(BaseSettings):
     supabase_url: str = ""
     supabase_key: str = ""
+    supabase_jwt_secret: str = ""
+    # Max HTTP connections the shared Supabase client keeps open
+    supabase_pool_size: int = 50
+    # Optional direct Postgres connection string for pooled reads
+    database_url: str = ""
     environment: str = "development"
     
+    # How the Gemini server talks to the MCP server: "memory" or "stdio"
+    mcp_transport: str = "memory"
+    
     # Test environment settings
     test_supabase_url: str = ""
     test_supabase_key: str = ""
     
-    model_config = {"env_file": ".env"}
+    # Frozen so the cached instance can't be mutated; other keys in .env
+    # (GOOGLE_API_KEY, LOG_LEVEL, ...) belong to other readers
+    model_config = SettingsConfigDict(env_file=".env", frozen=True, extra="ignore")
     
     @property
     def effective_supabase_url(self) -> str:
@@ -11,8 +11,8 @@ sys.path.insert(0, project_root)
 if __name__ == "__main__":
     try:
         # Import and run the MCP server from new structure
-        from app.servers.mcp.server import mcp
-        mcp.run()
+        from app.servers.mcp.server import main
+        main()
     except ImportError as e:
         print(f"Import error: {e}")
         print(f"Python executable: {sys.executable}")
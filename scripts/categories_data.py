@@ -1,26 +1,28 @@
 """
 Default expense categories for upload to Supabase
 """
+import itertools
 
-# Comprehensive expense categories with hierarchical structure
-DEFAULT_CATEGORIES = [
+# Comprehensive expense categories with hierarchical structure; tuples since
+# this is read-only reference data
+DEFAULT_CATEGORIES = (
     # Food & Dining
     {
         "name": "Food & Dining",
-        "subcategories": [
+        "subcategories": (
             "Groceries",
             "Restaurants", 
             "Fast Food",
             "Coffee & Tea",
             "Bars & Alcohol",
             "Food Delivery"
-        ]
+        )
     },
     
     # Transportation
     {
         "name": "Transportation",
-        "subcategories": [
+        "subcategories": (
             "Gas & Fuel",
             "Public Transit",
             "Rideshare & Taxi",
@@ -28,13 +30,13 @@ DEFAULT_CATEGORIES = [
             "Car Insurance",
             "Parking",
             "Tolls"
-        ]
+        )
     },
     
     # Shopping & Supplies
     {
         "name": "Shopping & Supplies",
-        "subcategories": [
+        "subcategories": (
             "Clothing",
             "Electronics",
             "Home & Garden",
@@ -42,13 +44,13 @@ DEFAULT_CATEGORIES = [
             "Household Supplies",
             "Books & Media",
             "Gifts"
-        ]
+        )
     },
     
     # Housing & Utilities
     {
         "name": "Housing & Utilities",
-        "subcategories": [
+        "subcategories": (
             "Rent",
             "Mortgage",
             "Electricity",
@@ -59,197 +61,101 @@ DEFAULT_CATEGORIES = [
             "Cable/Streaming",
             "Home Insurance",
             "Property Tax"
-        ]
+        )
     },
     
     # Healthcare & Medical
     {
         "name": "Healthcare & Medical",
-        "subcategories": [
+        "subcategories": (
             "Doctor Visits",
             "Prescriptions",
             "Dental",
             "Vision",
             "Health Insurance",
             "Medical Supplies"
-        ]
+        )
     },
     
     # Entertainment & Recreation
     {
         "name": "Entertainment & Recreation",
-        "subcategories": [
+        "subcategories": (
             "Movies & Theater",
             "Sports & Fitness",
             "Hobbies",
             "Travel & Vacation",
             "Gaming",
             "Music & Concerts"
-        ]
+        )
     },
     
     # Financial & Banking
     {
         "name": "Financial & Banking",
-        "subcategories": [
+        "subcategories": (
             "Bank Fees",
             "ATM Fees",
             "Investment Fees",
             "Credit Card Fees",
             "Loan Payments",
             "Insurance Premiums"
-        ]
+        )
     },
     
     # Education & Learning
     {
         "name": "Education & Learning",
-        "subcategories": [
+        "subcategories": (
             "Tuition",
             "Books & Supplies",
             "Online Courses",
             "Workshops",
             "Certification"
-        ]
+        )
     },
     
     # Work & Business
     {
         "name": "Work & Business",
-        "subcategories": [
+        "subcategories": (
             "Office Supplies",
             "Business Travel",
             "Professional Services",
             "Software & Tools",
             "Equipment"
-        ]
+        )
     },
     
     # Personal & Family
     {
         "name": "Personal & Family",
-        "subcategories": [
+        "subcategories": (
             "Childcare",
             "Pet Care",
             "Personal Services",
             "Subscriptions",
             "Donations",
             "Legal Services"
-        ]
+        )
     },
     
     # Miscellaneous
     {
         "name": "Miscellaneous",
-        "subcategories": [
+        "subcategories": (
             "Other",
             "Uncategorized",
             "Cash Withdrawal",
             "Transfers"
-        ]
+        )
     }
-]
+)
 
 # Flat list for simple upload (without hierarchy)
-FLAT_CATEGORIES = [
-    # Food & Dining
-    "Food & Dining",
-    "Groceries", 
-    "Restaurants",
-    "Fast Food",
-    "Coffee & Tea",
-    "Bars & Alcohol",
-    "Food Delivery",
-    
-    # Transportation
-    "Transportation",
-    "Gas & Fuel",
-    "Public Transit",
-    "Rideshare & Taxi", 
-    "Car Maintenance",
-    "Car Insurance",
-    "Parking",
-    "Tolls",
-    
-    # Shopping & Supplies
-    "Shopping & Supplies",
-    "Clothing",
-    "Electronics",
-    "Home & Garden",
-    "Personal Care",
-    "Household Supplies",
-    "Books & Media",
-    "Gifts",
-    
-    # Housing & Utilities
-    "Housing & Utilities",
-    "Rent",
-    "Mortgage",
-    "Electricity",
-    "Gas",
-    "Water",
-    "Internet",
-    "Phone",
-    "Cable/Streaming",
-    "Home Insurance",
-    "Property Tax",
-    
-    # Healthcare & Medical
-    "Healthcare & Medical",
-    "Doctor Visits",
-    "Prescriptions",
-    "Dental",
-    "Vision",
-    "Health Insurance",
-    "Medical Supplies",
-    
-    # Entertainment & Recreation
-    "Entertainment & Recreation",
-    "Movies & Theater",
-    "Sports & Fitness",
-    "Hobbies",
-    "Travel & Vacation",
-    "Gaming",
-    "Music & Concerts",
-    
-    # Financial & Banking
-    "Financial & Banking",
-    "Bank Fees",
-    "ATM Fees",
-    "Investment Fees",
-    "Credit Card Fees",
-    "Loan Payments",
-    "Insurance Premiums",
-    
-    # Education & Learning
-    "Education & Learning",
-    "Tuition",
-    "Books & Supplies",
-    "Online Courses",
-    "Workshops",
-    "Certification",
-    
-    # Work & Business
-    "Work & Business",
-    "Office Supplies",
-    "Business Travel",
-    "Professional Services",
-    "Software & Tools",
-    "Equipment",
-    
-    # Personal & Family
-    "Personal & Family",
-    "Childcare",
-    "Pet Care",
-    "Personal Services",
-    "Subscriptions",
-    "Donations",
-    "Legal Services",
-    
-    # Miscellaneous
-    "Miscellaneous",
-    "Other",
-    "Uncategorized",
-    "Cash Withdrawal",
-    "Transfers"
-]
\ No newline at end of file
+# Derived from the hierarchy so the two can't drift; parents come before
+# their subcategories and duplicates are dropped
+FLAT_CATEGORIES = tuple(dict.fromkeys(itertools.chain.from_iterable(
+    (group["name"], *group.get("subcategories", ())) for group in DEFAULT_CATEGORIES
+)))
+FLAT_CATEGORIES_SET = frozenset(FLAT_CATEGORIES)
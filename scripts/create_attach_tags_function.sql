@@ -0,0 +1,51 @@
+-- Function to attach tags to a transaction by value in one round trip
+-- Creates any tags that don't exist yet, links all of them to the
+-- transaction (skipping links that already exist) and returns the tags
+CREATE OR REPLACE FUNCTION attach_tags(
+    p_transaction_id UUID,
+    p_values TEXT[]
+)
+RETURNS TABLE (
+    tag_id UUID,
+    value TEXT
+) AS $$
+BEGIN
+    INSERT INTO tags (tag_id, value)
+    SELECT gen_random_uuid(), v.value
+    FROM (SELECT DISTINCT unnest(p_values) AS value) v
+    WHERE NOT EXISTS (SELECT 1 FROM tags t WHERE t.value = v.value);
+
+    INSERT INTO transaction_tags (transaction_id, tag_id)
+    SELECT p_transaction_id, t.tag_id
+    FROM tags t
+    WHERE t.value = ANY(p_values)
+      AND NOT EXISTS (
+          SELECT 1 FROM transaction_tags tt
+          WHERE tt.transaction_id = p_transaction_id AND tt.tag_id = t.tag_id
+      );
+
+    RETURN QUERY
+    SELECT t.tag_id, t.value
+    FROM tags t
+    WHERE t.value = ANY(p_values);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to get a tag by value, creating it if missing, in one round trip
+CREATE OR REPLACE FUNCTION get_or_create_tag(p_value TEXT)
+RETURNS TABLE (
+    tag_id UUID,
+    value TEXT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT t.tag_id, t.value FROM tags t WHERE t.value = p_value LIMIT 1;
+
+    IF NOT FOUND THEN
+        RETURN QUERY
+        INSERT INTO tags (tag_id, value)
+        VALUES (gen_random_uuid(), p_value)
+        RETURNING tags.tag_id, tags.value;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
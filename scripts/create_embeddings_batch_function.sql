@@ -0,0 +1,43 @@
+-- Function to upsert many transaction embeddings in one call
+-- p_rows is a JSON array of objects with transaction_id, transaction_text,
+-- embedding (pgvector text literal), category_id, category_name and an
+-- optional confidence_score. A null confidence keeps the stored one.
+-- Returns the number of rows written.
+CREATE OR REPLACE FUNCTION upsert_transaction_embeddings_batch(p_rows JSONB)
+RETURNS INTEGER AS $$
+    WITH upserted AS (
+        INSERT INTO transaction_embeddings (
+            transaction_id,
+            transaction_text,
+            embedding,
+            confirmed_category_id,
+            confirmed_category_name,
+            confidence_score
+        )
+        SELECT
+            r.transaction_id,
+            r.transaction_text,
+            r.embedding::vector(384),
+            r.category_id,
+            r.category_name,
+            r.confidence_score
+        FROM jsonb_to_recordset(p_rows) AS r(
+            transaction_id UUID,
+            transaction_text TEXT,
+            embedding TEXT,
+            category_id UUID,
+            category_name TEXT,
+            confidence_score FLOAT
+        )
+        ON CONFLICT (transaction_id)
+        DO UPDATE SET
+            transaction_text = EXCLUDED.transaction_text,
+            embedding = EXCLUDED.embedding,
+            confirmed_category_id = EXCLUDED.confirmed_category_id,
+            confirmed_category_name = EXCLUDED.confirmed_category_name,
+            confidence_score = COALESCE(EXCLUDED.confidence_score, transaction_embeddings.confidence_score),
+            updated_at = NOW()
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM upserted;
+$$ LANGUAGE sql;
@@ -29,8 +29,10 @@ CREATE TABLE IF NOT EXISTS transaction_embeddings (
 );
 
 -- Create index for vector similarity search
+-- Embeddings are stored unit length, so inner product ranks the same as
+-- cosine without computing norms per comparison
 CREATE INDEX idx_transaction_embeddings_vector ON transaction_embeddings 
-USING ivfflat (embedding vector_cosine_ops)
+USING ivfflat (embedding vector_ip_ops)
 WITH (lists = 100);
 
 -- Create index for transaction lookups
@@ -65,14 +67,14 @@ BEGIN
         te.transaction_text,
         te.confirmed_category_id,
         te.confirmed_category_name,
-        1 - (te.embedding <=> query_embedding) AS similarity_score,
+        -(te.embedding <#> query_embedding) AS similarity_score,
         t.merchant,
         t.amount,
         t.date
     FROM transaction_embeddings te
     JOIN transactions t ON te.transaction_id = t.transaction_id
-    WHERE 1 - (te.embedding <=> query_embedding) >= similarity_threshold
-    ORDER BY te.embedding <=> query_embedding
+    WHERE -(te.embedding <#> query_embedding) >= similarity_threshold
+    ORDER BY te.embedding <#> query_embedding
     LIMIT limit_count;
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,52 @@
+-- Function to categorize by vote over the nearest embedded transactions
+-- Mirrors the client-side rules it replaces: a near-identical match
+-- decides on its own, otherwise categories are weighted by similarity and
+-- the winner's share of the total weight is its confidence. Returns no rows
+-- when nothing is similar enough.
+CREATE OR REPLACE FUNCTION find_similar_transaction_category(
+    query_embedding vector(384),
+    limit_count INTEGER DEFAULT 5,
+    similarity_threshold FLOAT DEFAULT 0.7,
+    exact_match_threshold FLOAT DEFAULT 0.85
+)
+RETURNS TABLE (
+    category_id UUID,
+    category_name TEXT,
+    confidence FLOAT
+) AS $$
+    WITH nearest AS (
+        SELECT
+            te.confirmed_category_id,
+            te.confirmed_category_name,
+            -(te.embedding <#> query_embedding) AS similarity_score
+        FROM transaction_embeddings te
+        JOIN transactions t ON te.transaction_id = t.transaction_id
+        WHERE -(te.embedding <#> query_embedding) >= similarity_threshold
+        ORDER BY te.embedding <#> query_embedding
+        LIMIT limit_count
+    ),
+    matches AS (
+        SELECT n.*, row_number() OVER (ORDER BY n.similarity_score DESC) AS rank
+        FROM nearest n
+    ),
+    votes AS (
+        -- Ties go to the category seen first, with the id of its closest match
+        SELECT
+            (array_agg(m.confirmed_category_id ORDER BY m.rank))[1] AS category_id,
+            m.confirmed_category_name AS category_name,
+            SUM(m.similarity_score) AS weight,
+            MIN(m.rank) AS first_rank
+        FROM matches m
+        GROUP BY m.confirmed_category_name
+    )
+    SELECT
+        CASE WHEN top.similarity_score >= exact_match_threshold
+             THEN top.confirmed_category_id ELSE v.category_id END,
+        CASE WHEN top.similarity_score >= exact_match_threshold
+             THEN top.confirmed_category_name ELSE v.category_name END,
+        CASE WHEN top.similarity_score >= exact_match_threshold
+             THEN top.similarity_score
+             ELSE v.weight / NULLIF((SELECT SUM(similarity_score) FROM matches), 0) END
+    FROM (SELECT * FROM matches WHERE rank = 1) top
+    CROSS JOIN (SELECT * FROM votes ORDER BY weight DESC, first_rank LIMIT 1) v;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,40 @@
+-- Function to aggregate spending for a date range inside the database
+-- Returns totals, a per-category breakdown (largest first) and the top
+-- category so callers don't have to pull every transaction row over the
+-- wire just to sum it
+CREATE OR REPLACE FUNCTION spending_summary(
+    p_start_date TIMESTAMPTZ,
+    p_end_date TIMESTAMPTZ,
+    p_category_id UUID DEFAULT NULL
+)
+RETURNS JSON AS $$
+    WITH filtered AS (
+        SELECT t.amount, t.category_id
+        FROM transactions t
+        WHERE t.date BETWEEN p_start_date AND p_end_date
+          AND (p_category_id IS NULL OR t.category_id = p_category_id)
+    ),
+    by_category AS (
+        SELECT c.name, SUM(f.amount) AS total
+        FROM filtered f
+        JOIN categories c ON c.category_id = f.category_id
+        GROUP BY c.name
+    )
+    SELECT json_build_object(
+        'total_spent', COALESCE((SELECT SUM(amount) FROM filtered), 0),
+        'transaction_count', (SELECT COUNT(*) FROM filtered),
+        'category_breakdown', COALESCE(
+            (SELECT json_object_agg(name, total ORDER BY total DESC) FROM by_category),
+            '{}'::json
+        ),
+        'top_category', (
+            SELECT json_build_object('name', name, 'total', total)
+            FROM by_category
+            ORDER BY total DESC
+            LIMIT 1
+        )
+    );
+$$ LANGUAGE sql STABLE;
+
+-- Index to support the date range filter
+CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
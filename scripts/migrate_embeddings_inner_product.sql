@@ -0,0 +1,11 @@
+-- Switch the similarity index from cosine to inner product
+-- Embeddings are L2-normalized when generated, so inner product ranks the
+-- same as cosine and skips the norm computation per comparison.
+-- Re-run scripts/update_find_similar_transactions.sql and
+-- scripts/create_similar_category_function.sql afterwards so the search
+-- functions use the <#> operator this index serves.
+DROP INDEX IF EXISTS idx_transaction_embeddings_vector;
+
+CREATE INDEX idx_transaction_embeddings_vector ON transaction_embeddings
+USING ivfflat (embedding vector_ip_ops)
+WITH (lists = 100);
@@ -9,34 +9,35 @@ from pathlib import Path
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.database import supabase
-from app.crud import tags as tags_crud
-from app.schemas.schemas import TagCreate
-from app.mcp.tags_config import PREDEFINED_TAGS
+from app.core.database.connection import supabase
+from app.core.repositories.tag_repository import TagRepository
+from app.core.models.models import TagCreate
+from app.servers.mcp.tags_config import PREDEFINED_TAGS
 
 
 async def populate_tags():
     """Populate all predefined tags in the database"""
     print("🏷️  Populating predefined tags...")
     
+    tag_repo = TagRepository(supabase)
     created_count = 0
-    existing_count = 0
     
-    for tag_value, description in PREDEFINED_TAGS.items():
-        # Check if tag already exists
-        existing_tag = await tags_crud.get_tag_by_value(supabase, tag_value)
-        
-        if existing_tag:
+    # One query for the values that already exist, one insert for the rest
+    existing = {tag.value for tag in await tag_repo.get_tags_by_values(list(PREDEFINED_TAGS))}
+    for tag_value in PREDEFINED_TAGS:
+        if tag_value in existing:
             print(f"✓ Tag '{tag_value}' already exists")
-            existing_count += 1
-        else:
-            # Create new tag
-            try:
-                await tags_crud.create_tag(supabase, TagCreate(value=tag_value))
-                print(f"✓ Created tag '{tag_value}': {description}")
-                created_count += 1
-            except Exception as e:
-                print(f"✗ Failed to create tag '{tag_value}': {str(e)}")
+    existing_count = len(existing)
+    
+    to_create = [TagCreate(value=value) for value in PREDEFINED_TAGS if value not in existing]
+    if to_create:
+        try:
+            created = await tag_repo.create_tags(to_create)
+            for tag in created:
+                print(f"✓ Created tag '{tag.value}': {PREDEFINED_TAGS[tag.value]}")
+            created_count = len(created)
+        except Exception as e:
+            print(f"✗ Failed to create tags {[tag.value for tag in to_create]}: {str(e)}")
     
     print(f"\n📊 Summary:")
     print(f"   - Created: {created_count} new tags")
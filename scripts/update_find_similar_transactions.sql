@@ -23,14 +23,14 @@ BEGIN
         te.transaction_text,
         te.confirmed_category_id,
         te.confirmed_category_name,
-        1 - (te.embedding <=> query_embedding) AS similarity_score,
+        -(te.embedding <#> query_embedding) AS similarity_score,
         t.merchant,
         t.amount,
         t.date
     FROM transaction_embeddings te
     JOIN transactions t ON te.transaction_id = t.transaction_id
-    WHERE 1 - (te.embedding <=> query_embedding) >= similarity_threshold
-    ORDER BY te.embedding <=> query_embedding
+    WHERE -(te.embedding <#> query_embedding) >= similarity_threshold
+    ORDER BY te.embedding <#> query_embedding
     LIMIT limit_count;
 END;
 $$ LANGUAGE plpgsql;
\ No newline at end of file
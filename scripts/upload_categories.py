@@ -2,11 +2,13 @@
 """
 Script to upload default categories to Supabase database
 """
+import argparse
 import asyncio
 import sys
 import os
 from pathlib import Path
 from typing import Dict, List, Optional
+from uuid import UUID
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
@@ -17,20 +19,44 @@ if os.getenv("ENVIRONMENT") == "test":
     print("❌ Cannot run upload script in test environment!")
     sys.exit(1)
 
-from app.database import supabase
-from app.crud import categories
-from app.schemas.schemas import CategoryCreate
+from app.core.models.models import CategoryCreate, CategoryResponse
 from scripts.categories_data import DEFAULT_CATEGORIES, FLAT_CATEGORIES
 
+# Created in main() after arguments parse, so --help never builds a Supabase client
+categories = None
 
-async def check_existing_categories() -> List[str]:
-    """Check what categories already exist in the database"""
+async def check_existing_categories() -> Dict[str, CategoryResponse]:
+    """Check what categories already exist in the database, keyed by name"""
     try:
-        existing = await categories.get_categories(supabase, 0, 1000, active_only=False)
-        return [cat.name for cat in existing]
+        existing = await categories.get_categories(0, 1000, active_only=False)
+        return {cat.name: cat for cat in existing}
     except Exception as e:
         print(f"Error checking existing categories: {e}")
-        return []
+        return {}
+
+
+async def _create_categories(
+    names: List[str],
+    parent_ids: Dict[str, Optional[UUID]],
+    stats: Dict[str, int],
+    label: str,
+    indent: str = ""
+) -> Dict[str, CategoryResponse]:
+    """Create categories with a single bulk insert"""
+    try:
+        created = await categories.create_categories([
+            CategoryCreate(name=name, is_active=True, parent_category_id=parent_ids.get(name))
+            for name in names
+        ])
+    except Exception as e:
+        print(f"{indent}❌ Error creating {len(names)} {label}(s): {e}")
+        stats["errors"] += len(names)
+        return {}
+    
+    for category in created:
+        print(f"{indent}✓ Created {label}: {category.name}")
+    stats["created"] += len(created)
+    return {category.name: category for category in created}
 
 
 async def upload_hierarchical_categories(dry_run: bool = True) -> Dict[str, int]:
@@ -39,66 +65,50 @@ async def upload_hierarchical_categories(dry_run: bool = True) -> Dict[str, int]
     
     existing_categories = await check_existing_categories()
     stats = {"created": 0, "skipped": 0, "errors": 0}
-    parent_map = {}  # Track parent category IDs
+    parent_map = {name: cat.category_id for name, cat in existing_categories.items()}
+    # Names seen so far, so a name listed twice is only created once
+    existing_names = set(existing_categories)
     
+    # Parents first, all at once; children need their IDs
+    new_parents = []
     for category_group in DEFAULT_CATEGORIES:
         parent_name = category_group["name"]
-        
-        # Create parent category
-        if parent_name not in existing_categories:
-            if not dry_run:
-                try:
-                    parent_category = await categories.create_category(
-                        supabase, 
-                        CategoryCreate(name=parent_name, is_active=True)
-                    )
-                    parent_map[parent_name] = parent_category.category_id
-                    stats["created"] += 1
-                    print(f"✓ Created parent category: {parent_name}")
-                except Exception as e:
-                    print(f"❌ Error creating parent category '{parent_name}': {e}")
-                    stats["errors"] += 1
-                    continue
-            else:
-                print(f"[DRY RUN] Would create parent category: {parent_name}")
-                stats["created"] += 1
-        else:
+        if parent_name in existing_names:
             print(f"⏭ Skipped existing parent category: {parent_name}")
             stats["skipped"] += 1
-            # In real run, get existing parent ID
-            if not dry_run:
-                try:
-                    existing_parent = await categories.get_category_by_name(supabase, parent_name)
-                    if existing_parent:
-                        parent_map[parent_name] = existing_parent.category_id
-                except Exception as e:
-                    print(f"❌ Error getting existing parent '{parent_name}': {e}")
+        elif dry_run:
+            print(f"[DRY RUN] Would create parent category: {parent_name}")
+            stats["created"] += 1
+        else:
+            new_parents.append(parent_name)
+        existing_names.add(parent_name)
+    
+    if new_parents:
+        created = await _create_categories(new_parents, {}, stats, "parent category")
+        parent_map.update({name: cat.category_id for name, cat in created.items()})
+    
+    # Then every subcategory at once, across all parents
+    new_subcategories = []
+    sub_parent_ids = {}
+    for category_group in DEFAULT_CATEGORIES:
+        parent_name = category_group["name"]
+        if not dry_run and parent_name not in parent_map:
+            continue  # Parent failed to create
         
-        # Create subcategories
         for sub_name in category_group.get("subcategories", []):
-            if sub_name not in existing_categories:
-                if not dry_run:
-                    try:
-                        parent_id = parent_map.get(parent_name)
-                        await categories.create_category(
-                            supabase,
-                            CategoryCreate(
-                                name=sub_name, 
-                                is_active=True,
-                                parent_category_id=parent_id
-                            )
-                        )
-                        stats["created"] += 1
-                        print(f"  ✓ Created subcategory: {sub_name}")
-                    except Exception as e:
-                        print(f"  ❌ Error creating subcategory '{sub_name}': {e}")
-                        stats["errors"] += 1
-                else:
-                    print(f"  [DRY RUN] Would create subcategory: {sub_name}")
-                    stats["created"] += 1
-            else:
+            if sub_name in existing_names:
                 print(f"  ⏭ Skipped existing subcategory: {sub_name}")
                 stats["skipped"] += 1
+            elif dry_run:
+                print(f"  [DRY RUN] Would create subcategory: {sub_name}")
+                stats["created"] += 1
+            else:
+                new_subcategories.append(sub_name)
+                sub_parent_ids[sub_name] = parent_map.get(parent_name)
+            existing_names.add(sub_name)
+    
+    if new_subcategories:
+        await _create_categories(new_subcategories, sub_parent_ids, stats, "subcategory", indent="  ")
     
     return stats
 
@@ -110,36 +120,27 @@ async def upload_flat_categories(dry_run: bool = True) -> Dict[str, int]:
     existing_categories = await check_existing_categories()
     stats = {"created": 0, "skipped": 0, "errors": 0}
     
+    existing_names = set(existing_categories)
+    new_categories = []
     for category_name in FLAT_CATEGORIES:
-        if category_name not in existing_categories:
-            if not dry_run:
-                try:
-                    await categories.create_category(
-                        supabase,
-                        CategoryCreate(name=category_name, is_active=True)
-                    )
-                    stats["created"] += 1
-                    print(f"✓ Created category: {category_name}")
-                except Exception as e:
-                    print(f"❌ Error creating category '{category_name}': {e}")
-                    stats["errors"] += 1
-            else:
-                print(f"[DRY RUN] Would create category: {category_name}")
-                stats["created"] += 1
-        else:
+        if category_name in existing_names:
             print(f"⏭ Skipped existing category: {category_name}")
             stats["skipped"] += 1
+        elif dry_run:
+            print(f"[DRY RUN] Would create category: {category_name}")
+            stats["created"] += 1
+        else:
+            new_categories.append(category_name)
+        existing_names.add(category_name)
+    
+    if new_categories:
+        await _create_categories(new_categories, {}, stats, "category")
     
     return stats
 
 
-async def main():
-    """Main script execution"""
-    print("🏷 Expense Categories Upload Script")
-    print("=" * 50)
-    
-    # Parse command line arguments
-    import argparse
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments"""
     parser = argparse.ArgumentParser(description="Upload categories to Supabase")
     parser.add_argument("--structure", choices=["flat", "hierarchical"], default="hierarchical",
                        help="Category structure to upload (default: hierarchical)")
@@ -148,11 +149,18 @@ async def main():
     parser.add_argument("--force", action="store_true",
                        help="Skip confirmation prompt")
     
-    args = parser.parse_args()
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace):
+    """Main script execution"""
+    global categories
+    print("🏷 Expense Categories Upload Script")
+    print("=" * 50)
     
     # Safety check
     try:
-        from app.config import get_settings
+        from app.shared.config import get_settings
         settings = get_settings()
         if settings.environment == "test":
             print("❌ Cannot run in test environment!")
@@ -173,6 +181,10 @@ async def main():
             print("❌ Cancelled by user")
             sys.exit(0)
     
+    from app.core.database.connection import supabase
+    from app.core.repositories.category_repository import CategoryRepository
+    categories = CategoryRepository(supabase)
+    
     try:
         # Check database connection
         existing_count = len(await check_existing_categories())
@@ -205,4 +217,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(parse_args()))
\ No newline at end of file